@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Request, request, jsonify
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
@@ -7,7 +7,23 @@ from pathlib import Path
 import tempfile
 import os
 import traceback
-from werkzeug.utils import secure_filename
+import hashlib
+import json
+import io
+from io import BytesIO
+import gzip
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: the on-disk parse cache is disabled without pyarrow
+    pa = pq = None
+
+try:
+    import brotli
+except ImportError:  # optional: responses fall back to gzip without brotli
+    brotli = None
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
@@ -19,9 +35,70 @@ ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
 # Create upload directory if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# On-disk cache of parsed outlet tables (Parquet), reused by warm instances; needs pyarrow
+PARSE_CACHE_DIR = os.path.join(UPLOAD_FOLDER, "parse-cache")
+PARSE_CACHE_MAX_BYTES = int(os.environ.get("PARSE_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+# Bump whenever parsing output changes so stale on-disk cache entries are ignored
+PARSER_VERSION = "1"
+
+# Chunk size for hashing uploads that spilled to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Uploads up to this many bytes are parsed straight from memory; larger ones spill to an
+# anonymous temporary file in UPLOAD_FOLDER (0 = always spill)
+UPLOAD_SPILL_BYTES = int(os.environ.get("UPLOAD_SPILL_BYTES", str(16 * 1024 * 1024)))
+
+# Response compression: JSON/text bodies of at least COMPRESS_MIN_BYTES are sent as
+# br or gzip, whichever the client's Accept-Encoding prefers
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_MIMETYPES = {"application/json", "text/plain", "text/html"}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+class HashingBytesIO(BytesIO):
+    """In-memory upload buffer that updates 'sha256' with every chunk written to it."""
+
+    def __init__(self):
+        super().__init__()
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return super().write(data)
+
+class HashingTempFile(io.BufferedRandom):
+    """Anonymous temporary file for spilled uploads, updating 'sha256' as chunks are written."""
+
+    def __init__(self, directory):
+        owner = tempfile.TemporaryFile("wb+", buffering=0, dir=directory)
+        # On Windows TemporaryFile returns a wrapper that closes its file when collected
+        self._owner = owner
+        super().__init__(getattr(owner, "file", owner))
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return super().write(data)
+
+class UploadRequest(Request):
+    """
+    Request whose multipart file parts are buffered in a BytesIO when the request body is
+    at most UPLOAD_SPILL_BYTES, and otherwise in an anonymous temporary file. Either way
+    each upload gets its own stream, which the parser reads directly (no named temp path),
+    and its SHA-256 is computed as werkzeug writes the parts (see hash_upload).
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= UPLOAD_SPILL_BYTES:
+            return HashingBytesIO()
+        return HashingTempFile(UPLOAD_FOLDER)
+
+app.request_class = UploadRequest
+
 # ------------------------------
 # Helper functions from data_backend.py
 # ------------------------------
@@ -668,12 +745,168 @@ def process_financial_data(file_path):
             "traceback": traceback.format_exc()
         }
 
-def parseFloat(value):
-    """Helper function to parse float values"""
-    try:
-        return float(value) if value is not None else 0.0
-    except:
-        return 0.0
+class ParseCache:
+    """
+    On-disk cache of parsed outlet tables, one Parquet file per upload keyed by content
+    hash and PARSER_VERSION, so the first upload after a restart skips openpyxl.
+    Entries are written atomically (temp file + os.replace) and the least recently used
+    ones are evicted once the directory grows past 'max_bytes'.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = pq is not None and max_bytes > 0
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+        elif pq is None:
+            print("[INFO] pyarrow not installed, on-disk parse cache disabled")
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}-v{PARSER_VERSION}.parquet")
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            table = pq.read_table(path)
+            result = json.loads(table.schema.metadata[b"result"])
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[WARNING] Dropping unreadable parse cache entry {path}: {e}")
+            self._remove(path)
+            return None
+
+        result["data"] = table.to_pandas().replace({np.nan: None}).to_dict('records')
+        return result
+
+    def put(self, key, result):
+        """Store a successful parse result; a failed write is logged and skipped, never raised."""
+        if not self.enabled or not result.get("success"):
+            return
+        meta = {k: v for k, v in result.items() if k != "data"}
+        try:
+            table = pa.Table.from_pandas(pd.DataFrame(result["data"]), preserve_index=False)
+        except (pa.ArrowException, ValueError, TypeError) as e:
+            # e.g. an object column mixing text and numbers
+            print(f"[WARNING] Not caching parse result {key}: {e}")
+            return
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b"result": json.dumps(meta).encode(),
+        })
+
+        # Write to a temp file in the same directory, then atomically move it into place
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            os.close(fd)
+            pq.write_table(table, tmp_path, compression="zstd")
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            print(f"[WARNING] Could not write parse cache entry {key}: {e}")
+            if tmp_path is not None:
+                self._remove(tmp_path)
+            return
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".parquet"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:  # evicted by another worker
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+parse_cache = ParseCache(PARSE_CACHE_DIR, PARSE_CACHE_MAX_BYTES)
+
+def hash_upload(file):
+    """
+    Return the SHA-256 hex digest of an uploaded file's bytes, and rewind its stream for
+    parsing. Streams buffered by UploadRequest were hashed while the request was read;
+    any other stream is read once more.
+    """
+    stream = file.stream
+    if hasattr(stream, "sha256"):
+        stream.seek(0)
+        return stream.sha256.hexdigest()
+    digest = hashlib.sha256()
+    if isinstance(stream, BytesIO):
+        with stream.getbuffer() as view:
+            digest.update(view)
+    else:
+        stream.seek(0)
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+def choose_encoding(accept_encodings):
+    """Return 'br' or 'gzip' (highest q-value wins, br on ties), or None if neither is accepted."""
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = max(candidates, key=accept_encodings.quality)
+    return best if accept_encodings.quality(best) > 0 else None
+
+def compress_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+@app.after_request
+def compress_response(response):
+    """
+    Compress JSON/text responses for clients that accept br or gzip. Streamed or
+    already-encoded responses and bodies under COMPRESS_MIN_BYTES are sent as is.
+    Time spent and the compression ratio are reported in a Server-Timing entry.
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    start = time.perf_counter()
+    compressed = compress_body(body, encoding)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    ratio = len(body) / max(len(compressed), 1)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    response.headers.add(
+        'Server-Timing',
+        f'compress;dur={elapsed_ms:.1f};desc="{encoding} {len(body)}->{len(compressed)}B ratio {ratio:.1f}x"'
+    )
+    return response
 
 # Root and health check endpoint
 @app.route('/', methods=['GET'])
@@ -720,27 +953,20 @@ def process_file():
                 "error": "File type not allowed. Please upload Excel files (.xlsx, .xls)"
             }), 400
 
-        filename = secure_filename(file.filename)
-        temp_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(temp_path)
+        # Parse straight from the buffered upload stream (no /tmp/uploads round-trip)
+        content_hash = hash_upload(file)
 
-        try:
-            result = process_financial_data(temp_path)
-            
-            try:
-                os.remove(temp_path)
-            except PermissionError:
-                print(f"[WARNING] Could not delete temporary file {temp_path}")
-            
-            return jsonify(result)
+        result = parse_cache.get(content_hash)
+        cache_status = 'DISK'
+        if result is None:
+            result = process_financial_data(file.stream)
+            parse_cache.put(content_hash, result)
+            cache_status = 'MISS'
 
-        except Exception as e:
-            try:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-            except PermissionError:
-                print(f"[WARNING] Could not delete temporary file {temp_path}")
-            raise e
+        response = jsonify(result)
+        response.headers['X-Cache'] = cache_status
+        response.headers['X-Content-SHA256'] = content_hash
+        return response
 
     except Exception as e:
         return jsonify({
@@ -749,6 +975,91 @@ def process_file():
             "traceback": traceback.format_exc()
         }), 500
 
+# Finance-cost rows summed by /interest-analysis
+INTEREST_METRICS = [
+    '01-Bank Charges',
+    '02-Interest on Borrowings',
+    '03-Interest on Vehicle Loan',
+    '04-MG',
+    'Finance Cost'
+]
+
+def parseFloat(value):
+    """Helper function to parse float values"""
+    try:
+        return float(value) if value is not None else 0.0
+    except:
+        return 0.0
+
+def parse_float_matrix(rows, keys):
+    """
+    parseFloat(row.get(key, 0)) for every row and key, as an (n_rows, n_keys) float64 matrix.
+    Numbers, numeric strings and None convert in one np.array call; any other value sends
+    the matrix through parseFloat cell by cell. None, NaN and unparseable values become 0.
+    """
+    cells = [[row.get(key, 0) for key in keys] for row in rows]
+    try:
+        matrix = np.array(cells, dtype=float).reshape(len(rows), len(keys))
+    except (TypeError, ValueError):
+        matrix = np.array([[parseFloat(v) for v in row] for row in cells], dtype=float).reshape(len(rows), len(keys))
+    matrix[np.isnan(matrix)] = 0.0
+    return matrix
+
+def interest_analysis_payload(financial_data):
+    """
+    Interest cost analysis of outlet rows. Each field is parsed once into an
+    outlet x metric matrix; totals, outlet counts, averages and per-outlet interest
+    rates are array ops, and outlets are ordered by rate with a stable argsort.
+    """
+    n = len(financial_data)
+    matrix = parse_float_matrix(financial_data, INTEREST_METRICS + ['TOTAL REVENUE'])
+    amounts, revenue = matrix[:, :-1], matrix[:, -1]
+
+    # Totals per metric; metrics with no positive total are left out of the breakdown
+    totals = amounts.sum(axis=0)
+    outlet_counts = (amounts > 0).sum(axis=0)
+    included = totals > 0
+    interest_breakdown = {
+        metric: {
+            'total_amount': total,
+            'outlet_count': count,
+            'average_amount': total / n
+        }
+        for metric, total, count, keep in zip(INTEREST_METRICS, totals.tolist(), outlet_counts.tolist(), included.tolist())
+        if keep
+    }
+    total_interest = float(totals[included].sum())
+
+    # Interest rates by outlet (0 where there is no positive revenue)
+    outlet_interest = amounts.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        interest_rates = np.where(revenue > 0, outlet_interest / revenue * 100, 0.0)
+
+    # Sort by interest rate for efficiency analysis
+    order = np.argsort(interest_rates, kind='stable')
+    outlet_analysis = [
+        {
+            'outlet': financial_data[i].get('Outlet', 'Unknown'),
+            'manager': financial_data[i].get('Outlet Manager', 'Unknown'),
+            'total_interest': outlet_total,
+            'revenue': outlet_revenue,
+            'interest_rate': rate,
+            'interest_breakdown': dict(zip(INTEREST_METRICS, breakdown))
+        }
+        for i, outlet_total, outlet_revenue, rate, breakdown in zip(
+            order.tolist(), outlet_interest[order].tolist(), revenue[order].tolist(),
+            interest_rates[order].tolist(), amounts[order].tolist())
+    ]
+
+    return {
+        "success": True,
+        "total_interest_costs": total_interest,
+        "interest_breakdown": interest_breakdown,
+        "outlet_analysis": outlet_analysis,
+        "average_interest_rate": float(interest_rates.mean()) if n else 0,
+        "message": f"Interest analysis completed for {n} outlets"
+    }
+
 @app.route('/interest-analysis', methods=['POST'])
 @app.route('/api/interest-analysis', methods=['POST'])
 def interest_analysis():
@@ -765,55 +1076,7 @@ def interest_analysis():
 
         financial_data = data['financial_data']
         
-        interest_metrics = [
-            '01-Bank Charges',
-            '02-Interest on Borrowings', 
-            '03-Interest on Vehicle Loan',
-            '04-MG',
-            'Finance Cost'
-        ]
-        
-        total_interest = 0
-        interest_breakdown = {}
-        
-        for metric in interest_metrics:
-            total_amount = sum(parseFloat(item.get(metric, 0)) or 0 for item in financial_data)
-            if total_amount > 0:
-                interest_breakdown[metric] = {
-                    'total_amount': total_amount,
-                    'outlet_count': len([item for item in financial_data if item.get(metric, 0) and parseFloat(item.get(metric, 0)) > 0]),
-                    'average_amount': total_amount / len(financial_data) if financial_data else 0
-                }
-                total_interest += total_amount
-        
-        outlet_analysis = []
-        for item in financial_data:
-            outlet = item.get('Outlet', 'Unknown')
-            manager = item.get('Outlet Manager', 'Unknown')
-            revenue = parseFloat(item.get('TOTAL REVENUE', 0)) or 0
-            
-            outlet_interest = sum(parseFloat(item.get(metric, 0)) or 0 for metric in interest_metrics)
-            interest_rate = (outlet_interest / revenue * 100) if revenue > 0 else 0
-            
-            outlet_analysis.append({
-                'outlet': outlet,
-                'manager': manager,
-                'total_interest': outlet_interest,
-                'revenue': revenue,
-                'interest_rate': interest_rate,
-                'interest_breakdown': {metric: parseFloat(item.get(metric, 0)) or 0 for metric in interest_metrics}
-            })
-        
-        outlet_analysis.sort(key=lambda x: x['interest_rate'])
-        
-        return jsonify({
-            "success": True,
-            "total_interest_costs": total_interest,
-            "interest_breakdown": interest_breakdown,
-            "outlet_analysis": outlet_analysis,
-            "average_interest_rate": sum(item['interest_rate'] for item in outlet_analysis) / len(outlet_analysis) if outlet_analysis else 0,
-            "message": f"Interest analysis completed for {len(financial_data)} outlets"
-        })
+        return jsonify(interest_analysis_payload(financial_data))
         
     except Exception as e:
         return jsonify({
@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Request, request, jsonify, g, has_request_context, send_file
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
@@ -7,7 +7,46 @@ from pathlib import Path
 import tempfile
 import os
 import traceback
-from werkzeug.utils import secure_filename
+import hashlib
+import json
+import gzip
+import time
+import threading
+import sqlite3
+import calendar
+import shutil
+import uuid
+import csv
+import zipfile
+import bisect
+import sys
+import tracemalloc
+import cProfile
+import pstats
+import hmac
+import functools
+import io
+import multiprocessing
+from io import BytesIO, StringIO, TextIOWrapper
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: the on-disk parse cache is disabled without pyarrow
+    pa = pq = None
+
+try:
+    import brotli
+except ImportError:  # optional: responses fall back to gzip without brotli
+    brotli = None
+
+try:
+    import resource
+except ImportError:  # not available on Windows; peak RSS is then not reported
+    resource = None
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
@@ -19,9 +58,380 @@ ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
 # Create upload directory if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Financial metrics (rows under 'Particulars') extracted for every outlet
+REQUIRED_METRICS = [
+    "Direct Income",
+    "TOTAL REVENUE",
+    "COGS",
+    "Outlet Expenses",
+    "EBIDTA",
+    "Finance Cost",
+    "01-Bank Charges",
+    "02-Interest on Borrowings",
+    "03-Interest on Vehicle Loan",
+    "04-MG",
+    "PBT",
+    "WASTAGE",
+]
+
+# In-process cache of /process-file responses, keyed by the SHA-256 of the upload
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "32"))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# On-disk cache of parsed outlet tables (Parquet), surviving restarts; needs pyarrow
+PARSE_CACHE_DIR = os.path.join(UPLOAD_FOLDER, "parse-cache")
+PARSE_CACHE_MAX_BYTES = int(os.environ.get("PARSE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Bump whenever parsing output changes so stale on-disk cache entries are ignored
+PARSER_VERSION = "3"
+
+# Chunk size for hashing uploads that spilled to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Uploads up to this many bytes are parsed straight from memory; larger ones spill to an
+# anonymous temporary file in UPLOAD_FOLDER (0 = always spill)
+UPLOAD_SPILL_BYTES = int(os.environ.get("UPLOAD_SPILL_BYTES", str(32 * 1024 * 1024)))
+
+# Response compression: JSON/text bodies of at least COMPRESS_MIN_BYTES are sent as
+# br or gzip, whichever the client's Accept-Encoding prefers
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_MIMETYPES = {"application/json", "text/plain", "text/html"}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Parsed tables kept server-side under a dataset_id (the upload's SHA-256) for the
+# analytics endpoints; least recently used beyond the entry limit or idle past the TTL are dropped
+DATASET_STORE_MAX_ENTRIES = int(os.environ.get("DATASET_STORE_MAX_ENTRIES", "32"))
+DATASET_TTL_SECONDS = int(os.environ.get("DATASET_TTL_SECONDS", "3600"))
+
+# Opt-in SQLite history of monthly outlet P&L (one row per outlet, manager, month, metric);
+# set HISTORY_DB_PATH (e.g. "data/history.db") to record every parsed upload
+HISTORY_DB_PATH = os.environ.get("HISTORY_DB_PATH", "")
+
+# Background parse jobs (/jobs): worker threads (0 disables /jobs), max queued+running jobs,
+# and how long finished jobs and their results are kept. Jobs run inside the server worker
+# that accepted them, so a worker recycled by gunicorn's max_requests drops its in-flight
+# jobs; gunicorn.conf.py therefore only recycles workers by default when JOB_WORKERS=0
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.environ.get("JOB_MAX_PENDING", "16"))
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", "600"))
+
+# Job records are mirrored here so any server worker can answer GET /jobs/<job_id>. The
+# worker running a job refreshes its record every JOB_HEARTBEAT_SECONDS; unfinished records
+# whose worker is gone (or silent for 3 heartbeats) are reported as failed
+JOB_STATE_DIR = os.path.join(UPLOAD_FOLDER, "jobs")
+JOB_HEARTBEAT_SECONDS = float(os.environ.get("JOB_HEARTBEAT_SECONDS", "10"))
+
+# Batch uploads (/batch-process): worker processes for parsing files concurrently
+# (0 or 1 = parse in the request process), and limits on files per batch and on their
+# total size (ZIP members are checked against their uncompressed size)
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", str(min(4, os.cpu_count() or 1))))
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", "64"))
+BATCH_MAX_BYTES = int(os.environ.get("BATCH_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Per-sheet extraction results kept in memory, keyed by worksheet fingerprint, so re-issued
+# multi-sheet workbooks only re-parse the sheets that changed
+SHEET_CACHE_MAX_ENTRIES = int(os.environ.get("SHEET_CACHE_MAX_ENTRIES", "2048"))
+
+# Worker processes for per-outlet sheet extraction (0 or 1 = extract in the request process)
+OUTLET_SHEET_WORKERS = int(os.environ.get("OUTLET_SHEET_WORKERS", "0"))
+
+# CSV uploads are read by the pandas C parser in chunks of this many rows
+CSV_CHUNK_ROWS = int(os.environ.get("CSV_CHUNK_ROWS", "50000"))
+
+# Headers (Particulars / Month-YY row) are searched for in this many top rows when streaming
+HEADER_SCAN_ROWS = 200
+
+# Histogram bucket upper bounds (seconds) for /metrics stage and request durations
+TIMING_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Opt-in memory accounting (MEMORY_PROFILING=1): allocations are traced with tracemalloc and
+# each response reports its per-stage peaks; requests peaking above the threshold are logged
+# with the top allocation sites of every stage that peaked above MEMORY_SITES_MIN_MB.
+# Tracing slows parsing down and, as tracemalloc keeps one process-wide peak, per-request
+# figures are only exact when requests run one at a time.
+MEMORY_PROFILING = os.environ.get("MEMORY_PROFILING", "0") == "1"
+MEMORY_LOG_THRESHOLD_MB = float(os.environ.get("MEMORY_LOG_THRESHOLD_MB", "256"))
+MEMORY_TOP_SITES = int(os.environ.get("MEMORY_TOP_SITES", "5"))
+MEMORY_SITES_MIN_MB = float(os.environ.get("MEMORY_SITES_MIN_MB", "16"))
+MEMORY_TRACE_FRAMES = int(os.environ.get("MEMORY_TRACE_FRAMES", "1"))
+
+# On-demand cProfile capture: /process-file and /interest-analysis requests carrying
+# PROFILE_TOKEN (X-Profile-Token header or profile_token query param) run under cProfile, and
+# the newest PROFILE_MAX_FILES dumps (at most PROFILE_MAX_AGE_SECONDS old) are kept in
+# PROFILE_DIR for /profiles. An empty PROFILE_TOKEN disables profiling.
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(UPLOAD_FOLDER, "profiles"))
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "20"))
+PROFILE_MAX_AGE_SECONDS = int(os.environ.get("PROFILE_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+PROFILE_TEXT_LINES = 50
+
+# Zero-width characters removed when normalizing cell text
+ZERO_WIDTH_RE = r"[\u200b\u200c\u200d]"
+
+# Cell strings read as NaN, matching pd.read_excel defaults plus Excel error values
+NA_CELL_STRINGS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+    "#DIV/0!", "#NAME?", "#NULL!", "#NUM!", "#REF!", "#VALUE!",
+}
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+class HashingBytesIO(BytesIO):
+    """In-memory upload buffer that updates 'sha256' with every chunk written to it."""
+
+    def __init__(self):
+        super().__init__()
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return super().write(data)
+
+class HashingTempFile(io.BufferedRandom):
+    """Anonymous temporary file for spilled uploads, updating 'sha256' as chunks are written."""
+
+    def __init__(self, directory):
+        owner = tempfile.TemporaryFile("wb+", buffering=0, dir=directory)
+        # On Windows TemporaryFile returns a wrapper that closes its file when collected
+        self._owner = owner
+        super().__init__(getattr(owner, "file", owner))
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return super().write(data)
+
+class UploadRequest(Request):
+    """
+    Request whose multipart file parts are buffered in a BytesIO when the request body is
+    at most UPLOAD_SPILL_BYTES, and otherwise in an anonymous temporary file. Either way
+    each upload gets its own stream, which the parser reads directly (no named temp path),
+    and its SHA-256 is computed as werkzeug writes the parts (see hash_upload).
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= UPLOAD_SPILL_BYTES:
+            return HashingBytesIO()
+        return HashingTempFile(UPLOAD_FOLDER)
+
+app.request_class = UploadRequest
+
+# ------------------------------
+# Stage timing and metrics
+# ------------------------------
+class Histogram:
+    """
+    Thread-safe Prometheus-style histogram: cumulative bucket counts, sum and count per
+    label set, rendered in the text exposition format by render().
+    """
+
+    def __init__(self, name, help_text, label_names, buckets=TIMING_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        """Lines of the text exposition format for every series observed so far."""
+        with self._lock:
+            snapshot = [(labels, dict(series, buckets=list(series["buckets"])))
+                        for labels, series in sorted(self._series.items())]
+
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, series in snapshot:
+            labels = ",".join(f'{name}="{prometheus_label(value)}"'
+                              for name, value in zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["buckets"]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series["count"]}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series["sum"]!r}')
+            lines.append(f'{self.name}_count{{{labels}}} {series["count"]}')
+        return lines
+
+def prometheus_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+if MEMORY_PROFILING:
+    tracemalloc.start(MEMORY_TRACE_FRAMES)
+
+stage_histogram = Histogram("parse_stage_duration_seconds",
+                            "Time spent in each parsing stage.", ("stage",))
+request_histogram = Histogram("http_request_duration_seconds",
+                              "Request handling time by endpoint, method and status.",
+                              ("endpoint", "method", "status"))
+
+@contextmanager
+def timed_stage(stage):
+    """
+    Time the enclosed block as 'stage': observed in stage_histogram and, inside a request,
+    added to that response's Server-Timing header (repeated stages are summed; nested
+    stages are timed inclusively). With MEMORY_PROFILING on, the stage's traced memory
+    peak and allocation sites are recorded too.
+    """
+    tracking_memory = memory_tracking()
+    if tracking_memory:
+        enter_memory_stage(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if tracking_memory:
+            exit_memory_stage()
+        stage_histogram.observe(elapsed, stage)
+        if has_request_context():
+            spans = g.setdefault("stage_spans", {})
+            total, count = spans.get(stage, (0.0, 0))
+            spans[stage] = (total + elapsed, count + 1)
+
+def add_server_timing(response, *entries):
+    """Append entries to the response's single Server-Timing header."""
+    existing = response.headers.get('Server-Timing')
+    response.headers['Server-Timing'] = ", ".join(([existing] if existing else []) + list(entries))
+
+def allocation_sites(snapshot, baseline, limit):
+    """Top 'limit' source lines by memory allocated between two snapshots and still held."""
+    sites = []
+    for stat in sorted(snapshot.compare_to(baseline, "lineno"), key=lambda stat: stat.size_diff, reverse=True):
+        frame = stat.traceback[0]
+        if stat.size_diff <= 0 or len(sites) >= limit:
+            break
+        if frame.filename == tracemalloc.__file__:
+            continue
+        filename = frame.filename.split("site-packages" + os.sep)[-1]
+        sites.append(f"{filename}:{frame.lineno} +{stat.size_diff / (1024 * 1024):.2f}MB")
+    return sites
+
+def memory_tracking():
+    """True while a request is being served with MEMORY_PROFILING on."""
+    return MEMORY_PROFILING and tracemalloc.is_tracing() and has_request_context()
+
+def enter_memory_stage(stage):
+    """
+    Start measuring 'stage'. tracemalloc has a single peak counter, so the peak reached so
+    far is handed to the enclosing stages before it is reset for this one.
+    """
+    stack = g.setdefault("memory_stack", [])
+    snapshot = tracemalloc.take_snapshot() if MEMORY_TOP_SITES > 0 else None
+    current, peak = tracemalloc.get_traced_memory()
+    for frame in stack:
+        frame["peak"] = max(frame["peak"], peak)
+    tracemalloc.reset_peak()
+    stack.append({"stage": stage, "base": current, "peak": current, "snapshot": snapshot})
+
+def exit_memory_stage():
+    """
+    Finish the innermost stage and record {"peak_mb", "top_sites"} for it in g.memory_stages
+    (a stage run several times keeps its largest peak). Returns that record.
+    """
+    stack = g.memory_stack
+    frame = stack.pop()
+    frame["peak"] = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+    for outer in stack:
+        outer["peak"] = max(outer["peak"], frame["peak"])
+
+    peak_mb = (frame["peak"] - frame["base"]) / (1024 * 1024)
+    top_sites = []
+    if frame["snapshot"] is not None and peak_mb >= MEMORY_SITES_MIN_MB:
+        # Net allocations still held when the stage ended, by source line (diffing snapshots
+        # is slow, so only stages that peaked above MEMORY_SITES_MIN_MB get one)
+        top_sites = allocation_sites(tracemalloc.take_snapshot(), frame["snapshot"], MEMORY_TOP_SITES)
+
+    record = {"peak_mb": round(peak_mb, 2), "top_sites": top_sites}
+    stages = g.setdefault("memory_stages", {})
+    if frame["stage"] not in stages or record["peak_mb"] > stages[frame["stage"]]["peak_mb"]:
+        stages[frame["stage"]] = record
+    return record
+
+def max_rss_mb():
+    """Peak resident set size of this process so far (None where unavailable)."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return round(max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+@app.before_request
+def start_request_memory():
+    if memory_tracking():
+        g.request_max_rss_mb = max_rss_mb()
+        enter_memory_stage("request")
+
+@app.after_request
+def report_request_memory(response):
+    """
+    With MEMORY_PROFILING on: report the request's traced peak and per-stage peaks in
+    X-Memory-* headers, and log requests peaking above MEMORY_LOG_THRESHOLD_MB with
+    each stage's top allocation sites. Runs last, after compression and timing.
+    """
+    if not memory_tracking() or not g.get("memory_stack"):
+        return response
+    request_record = exit_memory_stage()
+    stages = {stage: record for stage, record in g.pop("memory_stages", {}).items() if stage != "request"}
+    rss_mb = max_rss_mb()
+
+    response.headers['X-Memory-Peak-MB'] = f"{request_record['peak_mb']:.2f}"
+    if stages:
+        response.headers['X-Memory-Stages'] = ", ".join(
+            f"{stage}={record['peak_mb']:.2f}MB" for stage, record in stages.items())
+    if rss_mb is not None:
+        response.headers['X-Memory-Max-RSS-MB'] = f"{rss_mb:.1f}"
+
+    if request_record["peak_mb"] >= MEMORY_LOG_THRESHOLD_MB:
+        print(f"[WARNING] Memory: {request.method} {request.path} peaked at "
+              f"{request_record['peak_mb']:.1f} MB traced (max RSS {rss_mb} MB, "
+              f"was {g.get('request_max_rss_mb')} MB)")
+        print("[MEMORY] " + json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "peak_mb": request_record["peak_mb"],
+            "max_rss_mb": rss_mb,
+            "top_sites": request_record["top_sites"],
+            "stages": stages,
+        }))
+    return response
+
+@app.before_request
+def start_request_timing():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def report_request_timing(response):
+    """
+    Add the request's stage spans and total time to Server-Timing, and record the request
+    duration by endpoint. Registered before compress_response, so it runs after it and the
+    total includes compression.
+    """
+    elapsed = time.perf_counter() - g.pop("request_start", time.perf_counter())
+    entries = []
+    for stage, (total, count) in g.pop("stage_spans", {}).items():
+        entries.append(f"{stage};dur={total * 1000:.1f}" + (f';desc="x{count}"' if count > 1 else ""))
+    entries.append(f"total;dur={elapsed * 1000:.1f}")
+    add_server_timing(response, *entries)
+
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    request_histogram.observe(elapsed, endpoint, request.method, str(response.status_code))
+    return response
+
 # ------------------------------
 # Helper functions from data_backend.py
 # ------------------------------
@@ -37,39 +447,309 @@ def norm_str(x):
 def norm_upper(x):
     return norm_str(x).upper()
 
-def detect_header(df0):
+def norm_str_array(values):
+    """Vectorized norm_str over an object array (same shape back, empty cells -> "")."""
+    values = np.asarray(values, dtype=object)
+    flat = values.ravel()
+    present = np.flatnonzero(pd.notna(flat))
+    out = np.full(flat.shape, "", dtype=object)
+    out[present] = (pd.Series(flat[present], dtype=object).astype(str)
+                    .str.replace(ZERO_WIDTH_RE, "", regex=True)
+                    .str.replace(r"\s+", " ", regex=True)
+                    .str.strip()
+                    .to_numpy(dtype=object))
+    return out.reshape(values.shape)
+
+def detect_header(df0, max_rows=None):
     """
     Return (hdr_row, part_col) using:
       A) exact 'PARTICULARS'
       B) substring 'PARTICULARS'
       C) fallback: row with most Month-YY tokens
+    Only the top 'max_rows' rows (default HEADER_SCAN_ROWS) are scanned, and the
+    non-empty cells there are normalized in one vectorized pass.
     """
-    # Apply norm_upper to all cells
-    df_str = df0.copy()
-    for col in df_str.columns:
-        df_str[col] = df_str[col].apply(lambda x: norm_upper(x) if pd.notna(x) else "")
+    band = df0.iloc[:max_rows or HEADER_SCAN_ROWS]
+    n_cols = band.shape[1]
+
+    # Normalize the non-empty cells of the band (zero-widths removed, stripped, upper-cased);
+    # whitespace inside a cell cannot be part of 'PARTICULARS' or a Month-YY token
+    flat = band.to_numpy(dtype=object).ravel()
+    present = np.flatnonzero(pd.notna(flat))
+    text = (pd.Series(flat[present], dtype=object).astype(str)
+            .str.replace(ZERO_WIDTH_RE, "", regex=True)
+            .str.strip()
+            .str.upper())
+    rows, cols = np.divmod(present, n_cols) if n_cols else (present, present)
 
     # A) exact
-    eq_pos = list(zip(*np.where(df_str.values == "PARTICULARS")))
-    if eq_pos:
-        return int(eq_pos[0][0]), int(eq_pos[0][1])
+    hits = np.flatnonzero(text.to_numpy() == "PARTICULARS")
+    if hits.size:
+        return int(rows[hits[0]]), int(cols[hits[0]])
 
     # B) contains
-    has_pos = list(zip(*np.where(df_str.apply(lambda s: isinstance(s, str) and "PARTICULARS" in s, axis=1).values)))
-    if has_pos:
-        return int(has_pos[0][0]), int(has_pos[0][1])
+    hits = np.flatnonzero(text.str.contains("PARTICULARS", regex=False).to_numpy(dtype=bool))
+    if hits.size:
+        return int(rows[hits[0]]), int(cols[hits[0]])
 
     # C) fallback
-    month_re = re.compile(r"^[A-Z]+-\d{2}(?:\.\d+)?$")
-    counts = [ sum(bool(month_re.match(v)) for v in df_str.iloc[i]) for i in range(df_str.shape[0]) ]
-    hdr_row = int(np.argmax(counts))
-    row_vals = list(df_str.iloc[hdr_row])
-    if "PARTICULARS" in row_vals:
-        part_col = row_vals.index("PARTICULARS")
-    else:
-        part_col = next((j for j, v in enumerate(row_vals) if norm_str(v)), 0)
+    is_month = text.str.fullmatch(r"[A-Z]+-\d{2}(?:\.\d+)?").to_numpy(dtype=bool)
+    counts = np.bincount(rows[is_month], minlength=band.shape[0])
+    hdr_row = int(np.argmax(counts)) if counts.size else 0
+    filled = cols[(rows == hdr_row) & (text.to_numpy() != "")]
+    part_col = int(filled[0]) if filled.size else 0
     return hdr_row, part_col
 
+class WorkbookSession:
+    """
+    Open an uploaded workbook once and share the parsed handle across every
+    format-detection path (Outlet wise, multi-worksheet, clean and raw).
+    Each sheet grid is parsed on first use and cached for the rest of the request.
+    """
+
+    def __init__(self, file_path):
+        # 'file_path' is a path or a seekable binary stream (e.g. an in-memory upload)
+        self.file_path = file_path
+        self.excel = pd.ExcelFile(file_path, engine="openpyxl")
+        self.sheet_names = self.excel.sheet_names
+        self._raw_frames = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._raw_frames.clear()
+        self.excel.close()
+
+    def _sheet_name(self, sheet_name):
+        if isinstance(sheet_name, int):
+            return self.sheet_names[sheet_name]
+        return sheet_name
+
+    def raw_frame(self, sheet_name=0, nrows=None):
+        """
+        Sheet read with NO header (raw layout), streamed with trailing blank rows and
+        columns dropped. A grid that was already parsed with at least 'nrows' rows is
+        sliced instead of being read again.
+        """
+        name = self._sheet_name(sheet_name)
+        cached = self._raw_frames.get(name)
+        if cached is not None:
+            cached_nrows, df = cached
+            if cached_nrows is None or (nrows is not None and nrows <= cached_nrows):
+                return df if nrows is None else df.iloc[:nrows]
+
+        rows = list(iter_sheet_rows(self.worksheet(name), max_row=nrows))
+        n_rows = rows[-1][0] + 1 if rows else 0
+        n_cols = max((len(values) for _, values in rows), default=0)
+        df = rows_frame(rows, n_rows, n_cols)
+        self._raw_frames[name] = (nrows, df)
+        return df
+
+    def raw_frames(self, sheet_names):
+        """
+        Load several sheet grids in one pass over the archive (workbook order), so the
+        workbook and shared-strings table are parsed once for all of them.
+        """
+        wanted = set(sheet_names)
+        return {name: self.raw_frame(name) for name in self.sheet_names if name in wanted}
+
+    def worksheet(self, sheet_name=0):
+        """The read-only openpyxl worksheet behind the session, for streaming reads."""
+        return self.excel.book[self._sheet_name(sheet_name)]
+
+    def first_row(self, sheet_name=0):
+        """Values of the first sheet row only (cheap probe that does not parse the whole sheet)."""
+        for _, values in iter_sheet_rows(self.worksheet(sheet_name), max_row=1):
+            return values
+        return []
+
+    def sheet_fingerprints(self, sheet_names):
+        """
+        {sheet name: SHA-256 of its worksheet XML part inside the xlsx archive}, also covering
+        the shared strings and styles parts every sheet's values depend on. Sheets whose
+        part can't be located are left out.
+        """
+        archive = self.excel.book._archive
+        parts = set(archive.namelist())
+        shared = hashlib.sha256()
+        for part in ("xl/sharedStrings.xml", "xl/styles.xml"):
+            if part in parts:
+                shared.update(archive.read(part))
+
+        fingerprints = {}
+        for name in sheet_names:
+            if name not in self.sheet_names:
+                continue
+            path = getattr(self.worksheet(name), "_worksheet_path", None)
+            if path not in parts:
+                continue
+            digest = shared.copy()
+            with archive.open(path) as part:
+                for chunk in iter(lambda: part.read(UPLOAD_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            fingerprints[name] = digest.hexdigest()
+        return fingerprints
+
+    def header_frame(self, sheet_name=0):
+        """
+        Sheet read with its first row as the header, derived from the cached raw grid
+        (same column naming as pd.read_excel: 'Unnamed: N' and 'name.1' for duplicates).
+        """
+        df_raw = self.raw_frame(sheet_name)
+        if df_raw.empty:
+            return pd.DataFrame()
+
+        columns = []
+        seen = {}
+        for i, col in enumerate(df_raw.iloc[0].tolist()):
+            name = f"Unnamed: {i}" if pd.isna(col) else col
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            columns.append(name)
+
+        df = df_raw.iloc[1:].reset_index(drop=True)
+        df.columns = columns
+        return df.infer_objects()
+
+@contextmanager
+def workbook_session(workbook):
+    """
+    Yield a WorkbookSession for 'workbook' (a file path, binary stream or open session).
+    Sessions opened here are closed on exit; sessions passed in are left to their owner.
+    """
+    if isinstance(workbook, WorkbookSession):
+        yield workbook
+        return
+    with timed_stage("open_workbook"):
+        session = WorkbookSession(workbook)
+    with session:
+        yield session
+
+# ------------------------------
+# Streaming ingestion (read-only, values-only)
+# ------------------------------
+def stream_cell(v):
+    """
+    Convert a values-only openpyxl cell the way pd.read_excel does:
+    blanks, NA strings and Excel errors -> NaN, whole floats -> int.
+    """
+    if v is None:
+        return np.nan
+    if isinstance(v, float):
+        return int(v) if v.is_integer() else v
+    if isinstance(v, str) and v in NA_CELL_STRINGS:
+        return np.nan
+    return v
+
+def iter_sheet_rows(worksheet, max_row=None):
+    """
+    Yield (row_idx, values) for every non-empty row of a read-only worksheet, one row at a time.
+    row_idx is the position pd.read_excel(header=None) would give the row; trailing blank
+    cells are dropped, so rows have different lengths, and rows with no data are skipped.
+    """
+    # Dimensions stored in the file are often wrong (formatted to row 1048576); rely on the data
+    worksheet.reset_dimensions()
+    for row_idx, row in enumerate(worksheet.iter_rows(max_row=max_row, values_only=True)):
+        if not row:
+            continue
+        values = [stream_cell(v) for v in row]
+        while values and values[-1] is np.nan:
+            values.pop()
+        if values:
+            yield row_idx, values
+
+def rows_array(rows, n_rows, n_cols):
+    """Object array of shape (n_rows, n_cols) from sparse (row_idx, values) pairs, NaN elsewhere."""
+    grid = np.full((n_rows, n_cols), np.nan, dtype=object)
+    for row_idx, values in rows:
+        grid[row_idx, :len(values)] = values
+    return grid
+
+def rows_frame(rows, n_rows, n_cols):
+    """Object DataFrame of shape (n_rows, n_cols) from sparse (row_idx, values) pairs."""
+    return pd.DataFrame(rows_array(rows, n_rows, n_cols))
+
+def stream_outlet_sheet(worksheet, required_rows=REQUIRED_METRICS, header_rows=HEADER_SCAN_ROWS):
+    """Single streaming pass over a raw P&L worksheet (Outlet wise / raw layout), see stream_outlet_rows."""
+    with timed_stage("stream_sheet"):
+        return stream_outlet_rows(iter_sheet_rows(worksheet), required_rows, header_rows)
+
+def stream_outlet_rows(rows, required_rows=REQUIRED_METRICS, header_rows=HEADER_SCAN_ROWS, header=None):
+    """
+    Single streaming pass over the (row_idx, values) rows of a raw P&L sheet.
+
+    The top 'header_rows' rows are buffered to detect the header; below it only the
+    rows whose 'Particulars' cell is a required metric are kept, plus a per-column flag
+    of whether the column holds any data. Memory is bounded by the header band and the
+    metric rows, not by the sheet length, and there is no row cap. 'header', if given,
+    is the (hdr_row, part_col) already detected on the same rows, and skips detect_header.
+    """
+    required = set(required_rows)
+    rows = iter(rows)
+
+    band = []
+    pending = []
+    for row_idx, values in rows:
+        if row_idx >= header_rows:
+            pending.append((row_idx, values))
+            break
+        band.append((row_idx, values))
+
+    if not band and not pending:
+        raise ValueError("Worksheet is empty.")
+
+    band_rows = band[-1][0] + 1 if band else 0
+    band_cols = max((len(values) for _, values in band), default=0)
+    if header is None:
+        with timed_stage("detect_header"):
+            header = detect_header(rows_frame(band, band_rows, band_cols), max_rows=header_rows)
+    hdr_row, part_col = header
+    header_band = rows_frame([(i, v) for i, v in band if i <= hdr_row], hdr_row + 1, band_cols)
+
+    n_rows = band_rows
+    n_cols = band_cols
+    nonempty = np.zeros(n_cols, dtype=bool)
+    metric_rows = []
+    particulars = []
+
+    def data_rows():
+        for row_idx, values in band:
+            if row_idx > hdr_row:
+                yield row_idx, values
+        yield from pending
+        yield from rows
+
+    for row_idx, values in data_rows():
+        n_rows = row_idx + 1
+        if len(values) > n_cols:
+            nonempty = np.concatenate([nonempty, np.zeros(len(values) - n_cols, dtype=bool)])
+            n_cols = len(values)
+        nonempty[:len(values)] |= pd.notna(values)
+
+        name = norm_str(values[part_col]) if part_col < len(values) else ""
+        if name in required:
+            metric_rows.append((name, values))
+        elif name and len(particulars) < 30 and name not in particulars:
+            particulars.append(name)
+
+    return {
+        "header_band": header_band,
+        "hdr_row": hdr_row,
+        "part_col": part_col,
+        "n_rows": n_rows,
+        "n_cols": n_cols,
+        "nonempty": nonempty,
+        "metric_rows": metric_rows,
+        "particulars": particulars,
+    }
+
 def get_name(df_raw, base_row, base_col, max_up=6, max_dx=2):
     """
     Find a non-empty text near (base_row, base_col) by scanning up to 'max_up' rows
@@ -89,186 +769,326 @@ def get_name(df_raw, base_row, base_col, max_up=6, max_dx=2):
                     return v
     return ""
 
-def process_outlet_wise_worksheet(file_path):
+def extract_outlet_blocks(grid, required_rows=REQUIRED_METRICS):
     """
-    Process the 'Outlet wise' worksheet from multi-sheet files (same format as data5.xlsx)
+    Build the outlet x metric table, one row per outlet (Month, %) column block, from a
+    streamed sheet grid (see stream_outlet_sheet). Returns (df_final, skipped_count, outlet_blocks).
     """
-    try:
-        print("[INFO] Processing 'Outlet wise' worksheet")
-        
-        # Read the "Outlet wise" worksheet with no header to preserve raw layout
-        # Limit to first 1000 rows for performance
-        df0 = pd.read_excel(file_path, sheet_name="Outlet wise", header=None, engine="openpyxl", nrows=1000)
-        print(f"[INFO] Raw data shape (limited to 1000 rows): {df0.shape}")
-        
-        # Detect header row/column using existing logic
-        hdr_row, part_col = detect_header(df0)
-        print(f"[INFO] Header detected at row={hdr_row}, particulars_col={part_col}")
+    with timed_stage("find_blocks"):
+        orig_idx_after, outlet_blocks = find_outlet_blocks(grid, required_rows)
+    with timed_stage("name_lookup"):
+        outlet_names, manager_names = block_name_maps(grid)
+    with timed_stage("assemble"):
+        df_final, skipped_count = assemble_outlet_blocks(grid, orig_idx_after, outlet_blocks,
+                                                         outlet_names, manager_names)
+    return df_final, skipped_count, outlet_blocks
+
+def find_outlet_blocks(grid, required_rows=REQUIRED_METRICS):
+    """
+    Locate the outlet (Month, %) column pairs right of 'Particulars', after dropping empty
+    columns. Returns (orig_idx_after, outlet_blocks): the original sheet index of every kept
+    column, and (filtered position, month label, % label) per block.
+    """
+    df0 = grid["header_band"]
+    hdr_row, part_col, n_cols = grid["hdr_row"], grid["part_col"], grid["n_cols"]
+
+    # Header labels from 'Particulars' onwards, with a parallel array of original column indices
+    header = list(df0.iloc[hdr_row]) + [np.nan] * (n_cols - df0.shape[1])
+    cols = header[part_col:]
+    cols[0] = "Particulars"
+    orig_idx_after = np.arange(n_cols)[part_col:]
+
+    # Drop entirely empty columns (over the data area), but keep month / % columns
+    empty_cols_mask = ~grid["nonempty"][part_col:]
+    month_re = re.compile(r"^[A-Za-z]+-\d{2}(?:\.\d+)?$")
+    pct_re = re.compile(r"^%(?:\.\d+)?$")
+
+    for i, col in enumerate(cols):
+        if empty_cols_mask[i]:
+            col_name = norm_str(col)
+            if month_re.match(col_name) or pct_re.match(col_name):
+                empty_cols_mask[i] = False
+
+    cols = [c for c, empty in zip(cols, empty_cols_mask) if not empty]
+    orig_idx_after = orig_idx_after[~empty_cols_mask]
+
+    print(f"[INFO] After filtering empty columns: {(grid['n_rows'] - hdr_row - 1, len(cols))}")
+
+    metric_rows = grid["metric_rows"]
+    print(f"[INFO] Found {len(metric_rows)} required metric rows")
+
+    if not metric_rows:
+        print("DEBUG — Available 'Particulars' values (first 30):")
+        available_particulars = grid["particulars"]
+        print(available_particulars)
+
+        # Try to find similar matches
+        print("DEBUG — Looking for similar matches...")
+        for req_row in required_rows:
+            matches = [p for p in available_particulars if req_row.lower() in str(p).lower()]
+            if matches:
+                print(f"  '{req_row}' might match: {matches}")
+
+        raise ValueError("None of the required rows were found under 'Particulars'.")
+
+    # Detect all outlet (Month, %) column pairs by **position** - AFTER filtering
+    outlet_blocks = []
+    for i in range(1, len(cols) - 1):  # 0 is 'Particulars'
+        cname = norm_str(cols[i])
+        nname = norm_str(cols[i+1])
+        if month_re.match(cname) and (nname == "%" or pct_re.match(nname)):
+            outlet_blocks.append((i, cols[i], cols[i+1]))
+
+    print(f"[INFO] Found {len(outlet_blocks)} outlet blocks")
+
+    if not outlet_blocks:
+        print("DEBUG — Columns after 'Particulars':", cols[:20], " ... total:", len(cols))
+        print("DEBUG — Looking for month patterns...")
+        for i, col in enumerate(cols[1:6]):  # Check first 5 columns after Particulars
+            print(f"  Column {i+1}: '{col}' -> month_match: {bool(month_re.match(norm_str(col)))}")
+        raise ValueError("No Month/% pairs detected (e.g., 'June-25' followed by '%').")
+
+    return orig_idx_after, outlet_blocks
+
+def block_name_maps(grid):
+    """
+    (outlet_names, manager_names): the Outlet / Manager label resolved for every sheet
+    column from the rows above the header, normalizing the header band once.
+    """
+    df0 = grid["header_band"]
+    hdr_row, n_cols = grid["hdr_row"], grid["n_cols"]
 
-        # Rows above header where Outlet/Manager live
-        outlet_row = max(hdr_row - 1, 0)   # often the outlet names
-        manager_row = max(hdr_row - 3, 0)  # often the managers
+    # Rows above header where Outlet/Manager live
+    outlet_row = max(hdr_row - 1, 0)   # often the outlet names
+    manager_row = max(hdr_row - 3, 0)  # often the managers
 
-        # Build headered DataFrame from hdr_row
-        df_after = df0.iloc[hdr_row:, :].copy()
+    band_names = np.full((df0.shape[0], n_cols), "", dtype=object)
+    band_names[:, :df0.shape[1]] = norm_str_array(df0.to_numpy(dtype=object))
+    outlet_names  = name_map(band_names, outlet_row,  max_up=6)
+    manager_names = name_map(band_names, manager_row, max_up=8)
+    return outlet_names, manager_names
 
-        # Build a parallel array of original column indices
-        orig_idx_full = np.arange(df0.shape[1])
-        orig_idx_after = orig_idx_full.copy()
+def assemble_outlet_blocks(grid, orig_idx_after, outlet_blocks, outlet_names, manager_names):
+    """
+    One row per outlet block with its Outlet / Manager / Month labels and metric values,
+    skipping the consolidated summary. Returns (df_final, skipped_count). Month keeps only
+    the month name of the header label ('June-25' -> 'June'); the YYYY-MM of each name is
+    kept in df_final.attrs["month_periods"] for the history store.
+    """
+    metric_rows = grid["metric_rows"]
+    n_cols = grid["n_cols"]
+
+    # Resolve Outlet / Manager / Month for each block, skipping the consolidated summary
+    block_cols = []
+    outlets, managers, months = [], [], []
+    month_years = {}
+    skipped_count = 0
+
+    for (val_idx, val_col_name, pct_col_name) in outlet_blocks:
+        # Map filtered column position -> original sheet column index
+        orig_col_idx = int(orig_idx_after[val_idx])
+
+        outlet_name  = outlet_names[orig_col_idx]
+        manager_name = manager_names[orig_col_idx]
+
+        # Skip consolidated summary column if it happens to be detected
+        if outlet_name.lower() == "consolidated summary" or "consolidated" in outlet_name.lower():
+            skipped_count += 1
+            continue
+
+        # Month label
+        month_label = norm_str(val_col_name)
+        block_cols.append(orig_col_idx)
+        outlets.append(outlet_name)
+        managers.append(manager_name)
+        months.append(month_label.split("-")[0] if "-" in month_label else month_label)
+        month_years.setdefault(months[-1], set()).add(month_key(re.sub(r"\.\d+$", "", month_label)))
+
+    # Outlet x metric matrix in one fancy-indexing step over the block columns;
+    # a metric listed twice under 'Particulars' keeps its last row
+    metric_pos = {}
+    for i, (metric, _) in enumerate(metric_rows):
+        metric_pos[metric] = i
+    metric_grid = rows_array(list(enumerate(values for _, values in metric_rows)), len(metric_rows), n_cols)
+    block_values = metric_grid[np.ix_(list(metric_pos.values()), block_cols)].T
+
+    columns = {
+        "Outlet": np.array(outlets, dtype=object),
+        "Outlet Manager": np.array(managers, dtype=object),
+        "Month": np.array(months, dtype=object),
+    }
+    for j, metric in enumerate(metric_pos):
+        columns[metric] = block_values[:, j]
+    df_final = pd.DataFrame(columns).infer_objects()
+
+    # A month name seen under more than one year (or none) gets no period
+    df_final.attrs["month_periods"] = {
+        month: keys.pop() for month, keys in month_years.items() if len(keys) == 1 and None not in keys
+    }
+    return df_final, skipped_count
+
+def name_map(names, base_row, max_up):
+    """
+    get_name for every column at once. 'names' is the header band normalized with
+    norm_str_array; each row is first resolved laterally with the same 0, -1, +1, -2, +2
+    priority, then the nearest non-empty row at or above 'base_row' (up to 'max_up' rows
+    up) wins, i.e. the band is forward-filled downwards. Returns one name per column.
+    """
+    top = max(base_row - max_up, 0)
+    band = names[top:base_row + 1]
+    n_rows, n_cols = band.shape
 
-        # Set header from the first row of df_after
-        df_after.columns = df_after.iloc[0]
-        df_after = df_after.iloc[1:].reset_index(drop=True)
+    lateral = band.copy()
+    for dx in (-1, 1, -2, 2):
+        shifted = np.full_like(band, "")
+        if dx < 0:
+            shifted[:, -dx:] = band[:, :n_cols + dx]
+        else:
+            shifted[:, :n_cols - dx] = band[:, dx:]
+        lateral = np.where(lateral == "", shifted, lateral)
 
-        # Slice columns from 'Particulars' **by position**
-        df_after = df_after.iloc[:, part_col:].copy()
-        orig_idx_after = orig_idx_after[part_col:]  # keep the same slice for the index map
+    nearest = np.where(lateral != "", np.arange(n_rows)[:, None], -1).max(axis=0, initial=-1)
+    return np.where(nearest >= 0, lateral[nearest.clip(0), np.arange(n_cols)], "")
 
-        # Rename first column to 'Particulars'
-        new_cols = list(df_after.columns)
-        new_cols[0] = "Particulars"
-        df_after.columns = new_cols
+RESPONSE_FORMATS = ("records", "columnar")
 
-        # Compute a mask of entirely empty columns (over the data area)
-        empty_cols_mask = df_after.isna().all(axis=0).values
-        
-        # Additional check: don't remove columns that might be outlet columns (have month patterns)
-        month_re = re.compile(r"^[A-Za-z]+-\d{2}(?:\.\d+)?$")
-        pct_re = re.compile(r"^%(?:\.\d+)?$")
-        
-        for i, col in enumerate(df_after.columns):
-            if empty_cols_mask[i]:  # If column is empty
-                col_name = norm_str(col)
-                # Don't remove if it looks like a month column or % column
-                if month_re.match(col_name) or pct_re.match(col_name):
-                    empty_cols_mask[i] = False
-        
-        # Apply the same mask to BOTH df_after and the index map
-        df_after = df_after.loc[:, ~empty_cols_mask].copy()
-        orig_idx_after = orig_idx_after[~empty_cols_mask]
-
-        print(f"[INFO] After filtering empty columns: {df_after.shape}")
-
-        # Filter required metrics
-        required_rows = [
-            "Direct Income",
-            "TOTAL REVENUE",
-            "COGS",
-            "Outlet Expenses",
-            "EBIDTA",
-            "Finance Cost",
-            "01-Bank Charges",
-            "02-Interest on Borrowings",
-            "03-Interest on Vehicle Loan",
-            "04-MG",
-            "PBT",
-            "WASTAGE",
-        ]
-        
-        df_after["Particulars"] = df_after["Particulars"].astype(str).apply(norm_str)
-        df_req = df_after[df_after["Particulars"].isin(required_rows)].reset_index(drop=True)
-        
-        print(f"[INFO] Found {len(df_req)} required metric rows")
-        
-        if df_req.empty:
-            print("DEBUG — Available 'Particulars' values (first 30):")
-            available_particulars = df_after["Particulars"].dropna().unique()[:30]
-            print(available_particulars)
-            
-            # Try to find similar matches
-            print("DEBUG — Looking for similar matches...")
-            for req_row in required_rows:
-                matches = [p for p in available_particulars if req_row.lower() in str(p).lower()]
-                if matches:
-                    print(f"  '{req_row}' might match: {matches}")
-            
-            raise ValueError("None of the required rows were found under 'Particulars'.")
-
-        # Detect all outlet (Month, %) column pairs by **position** - AFTER filtering
-        cols = list(df_after.columns)  # Use df_after (after empty column filtering) instead of df_req
-        month_re = re.compile(r"^[A-Za-z]+-\d{2}(?:\.\d+)?$")
-        pct_re   = re.compile(r"^%(?:\.\d+)?$")
-
-        outlet_blocks = []
-        for i in range(1, len(cols) - 1):  # 0 is 'Particulars'
-            cname = norm_str(cols[i])
-            nname = norm_str(cols[i+1])
-            if month_re.match(cname) and (nname == "%" or pct_re.match(nname)):
-                outlet_blocks.append((i, cols[i], cols[i+1]))
-
-        print(f"[INFO] Found {len(outlet_blocks)} outlet blocks")
-
-        if not outlet_blocks:
-            print("DEBUG — Columns after 'Particulars':", cols[:20], " ... total:", len(cols))
-            print("DEBUG — Looking for month patterns...")
-            for i, col in enumerate(cols[1:6]):  # Check first 5 columns after Particulars
-                print(f"  Column {i+1}: '{col}' -> month_match: {bool(month_re.match(norm_str(col)))}")
-            raise ValueError("No Month/% pairs detected (e.g., 'June-25' followed by '%').")
-
-        # Build final rows
-        final_rows = []
-        skipped_count = 0
-
-        for (val_idx, val_col_name, pct_col_name) in outlet_blocks:
-            # Map df_after column position -> original df0 column index
-            orig_col_idx = int(orig_idx_after[val_idx])
-
-            # Outlet / Manager via robust scanning
-            outlet_name  = get_name(df0, outlet_row,  orig_col_idx, max_up=6, max_dx=2)
-            manager_name = get_name(df0, manager_row, orig_col_idx, max_up=8, max_dx=2)
-
-            # Skip consolidated summary column if it happens to be detected
-            if outlet_name.lower() == "consolidated summary" or "consolidated" in outlet_name.lower():
-                skipped_count += 1
-                continue
+# /process-file only: one outlet record per line (application/x-ndjson), then a summary line
+STREAM_FORMAT = "ndjson"
 
-            # Month label
-            month_label = norm_str(val_col_name)
-            month = month_label.split("-")[0] if "-" in month_label else month_label
+# Internal layout the NDJSON stream parses to: the outlet table DataFrame itself as "data",
+# serialized NDJSON_CHUNK_ROWS rows at a time while streaming
+FRAME_FORMAT = "frame"
+NDJSON_CHUNK_ROWS = 1000
 
-            row = {
-                "Outlet": outlet_name,
-                "Outlet Manager": manager_name,
-                "Month": month
+def column_values(column):
+    """
+    Convert one column's NumPy array to a JSON-ready list, with NaN/NaT/None as None.
+    Numeric columns go through ndarray.tolist() and only the NaN slots are patched.
+    """
+    values = column.to_numpy()
+    if values.dtype.kind in "mM":
+        # Keep Timestamps (tolist() on datetime64[ns] would give raw integers)
+        values = column.astype(object).to_numpy()
+    if values.dtype.kind in "iub":
+        return values.tolist()
+    out = values.tolist()
+    missing = np.isnan(values) if values.dtype.kind == "f" else pd.isna(values)
+    for i in np.flatnonzero(missing):
+        out[i] = None
+    return out
+
+def outlet_payload(df, response_format="records"):
+    """
+    Serialize the final outlet table for the JSON response.
+    'records' (default): {"data": [{col: value, ...}, ...]}
+    'columnar': {"columns": [...], "data": {col: [...]}} built straight from the column
+    arrays, without the DataFrame.replace copy the records path needs.
+    FRAME_FORMAT (internal): {"columns": [...], "data": df}, nothing serialized yet.
+    Either way "month_periods" ({Month: "YYYY-MM"}) is added when the table has one.
+    """
+    with timed_stage("serialize"):
+        if response_format == FRAME_FORMAT:
+            payload = {"columns": list(df.columns), "data": df}
+        elif response_format == "columnar":
+            payload = {
+                "columns": list(df.columns),
+                "data": {col: column_values(df[col]) for col in df.columns},
             }
+        else:
+            payload = {"data": df.replace({np.nan: None}).to_dict('records')}
+    if df.attrs.get("month_periods"):
+        payload["month_periods"] = df.attrs["month_periods"]
+    return payload
 
-            # Copy metrics by position
-            for _, req_row in df_req.iterrows():
-                metric = req_row["Particulars"]
-                value  = req_row.iat[val_idx] if val_idx < df_req.shape[1] else np.nan
-                row[metric] = value
-
-            final_rows.append(row)
-
-        df_final = pd.DataFrame(final_rows)
-        print(f"[INFO] Created {len(df_final)} final outlet records")
-        print(f"[INFO] Skipped {skipped_count} consolidated outlets")
-        print(f"[INFO] Total outlet blocks processed: {len(outlet_blocks)}")
-
-        # Order + numeric coercion
-        required_order = [
-            "Outlet", "Outlet Manager", "Month",
-            "Direct Income", "TOTAL REVENUE", "COGS", "Outlet Expenses",
-            "EBIDTA", "Finance Cost",
-            "01-Bank Charges", "02-Interest on Borrowings",
-            "03-Interest on Vehicle Loan", "04-MG",
-            "PBT", "WASTAGE"
-        ]
-        for c in required_order:
-            if c not in df_final.columns:
-                df_final[c] = np.nan
-        df_final = df_final[required_order].copy()
-
-        num_cols = [c for c in required_order if c not in ("Outlet", "Outlet Manager", "Month")]
-        df_final[num_cols] = df_final[num_cols].apply(pd.to_numeric, errors="coerce")
-
-        # Convert to list of dictionaries for JSON serialization
-        df_final_clean = df_final.replace({np.nan: None})
-        result_data = df_final_clean.to_dict('records')
+def outlet_table_from_grid(grid):
+    """
+    Final outlet table (required column order, numeric metrics) from a streamed raw-layout
+    grid (see stream_outlet_rows). Shared by the Outlet wise, raw and CSV paths.
+    """
+    print(f"[INFO] Raw data shape: {(grid['n_rows'], grid['n_cols'])}")
+    print(f"[INFO] Header detected at row={grid['hdr_row']}, particulars_col={grid['part_col']}")
+
+    df_final, skipped_count, outlet_blocks = extract_outlet_blocks(grid)
+    print(f"[INFO] Created {len(df_final)} final outlet records")
+    print(f"[INFO] Skipped {skipped_count} consolidated outlets")
+    print(f"[INFO] Total outlet blocks processed: {len(outlet_blocks)}")
+
+    # Order + numeric coercion
+    required_order = [
+        "Outlet", "Outlet Manager", "Month",
+        "Direct Income", "TOTAL REVENUE", "COGS", "Outlet Expenses",
+        "EBIDTA", "Finance Cost",
+        "01-Bank Charges", "02-Interest on Borrowings",
+        "03-Interest on Vehicle Loan", "04-MG",
+        "PBT", "WASTAGE"
+    ]
+    for c in required_order:
+        if c not in df_final.columns:
+            df_final[c] = np.nan
+    df_final = df_final[required_order].copy()
+
+    num_cols = [c for c in required_order if c not in ("Outlet", "Outlet Manager", "Month")]
+    df_final[num_cols] = df_final[num_cols].apply(pd.to_numeric, errors="coerce")
+    return df_final
+
+def clean_outlet_table(df_clean):
+    """
+    Final outlet table from a clean outlet-based frame (outlets as rows): required columns
+    in order, numeric metrics, consolidated summary outlets dropped. Works row-wise, so it
+    can be applied to chunks of a large file and the results concatenated.
+    """
+    df_final = df_clean.copy()
+    
+    # Ensure required columns exist
+    required_columns = [
+        "Outlet", "Outlet Manager", "Month",
+        "Direct Income", "TOTAL REVENUE", "COGS", "Outlet Expenses",
+        "EBIDTA", "Finance Cost", "PBT", "WASTAGE"
+    ]
+    
+    # Add missing columns with NaN values
+    for col in required_columns:
+        if col not in df_final.columns:
+            df_final[col] = np.nan
+    
+    # Reorder columns
+    df_final = df_final[required_columns].copy()
+    
+    # Convert numeric columns
+    numeric_cols = [c for c in required_columns if c not in ("Outlet", "Outlet Manager", "Month")]
+    df_final[numeric_cols] = df_final[numeric_cols].apply(pd.to_numeric, errors="coerce")
+    
+    # Filter out only consolidated summary outlets (include all outlets regardless of revenue)
+    return df_final[
+        (~df_final['Outlet'].str.contains('consolidated', case=False, na=False))
+    ].copy()
+
+def is_clean_layout(header_cols):
+    """True when a header row has Outlet / Outlet Manager columns plus at least one financial metric."""
+    has_outlet_col = 'Outlet' in header_cols
+    has_manager_col = 'Outlet Manager' in header_cols
+    has_financial_metrics = any(col in header_cols for col in ['TOTAL REVENUE', 'Direct Income', 'COGS', 'EBIDTA'])
+    print(f"[DEBUG] Clean format detection: has_outlet_col={has_outlet_col}, has_manager_col={has_manager_col}, has_financial_metrics={has_financial_metrics}")
+    return has_outlet_col and has_manager_col and has_financial_metrics
+
+def process_outlet_wise_worksheet(workbook, response_format="records"):
+    """
+    Process the 'Outlet wise' worksheet from multi-sheet files (same format as data5.xlsx).
+    'workbook' is a file path or an open WorkbookSession; 'response_format' is passed to
+    outlet_payload.
+    """
+    try:
+        print("[INFO] Processing 'Outlet wise' worksheet")
         
+        # Stream the "Outlet wise" worksheet row by row (read-only, no row cap)
+        with workbook_session(workbook) as session:
+            grid = stream_outlet_sheet(session.worksheet("Outlet wise"))
+        df_final = outlet_table_from_grid(grid)
+
+        # Serialize for JSON (NaN values become None)
         return {
             "success": True,
-            "data": result_data,
+            **outlet_payload(df_final, response_format),
             "outlets_count": len(df_final),
             "message": f"Successfully processed {len(df_final)} outlet records from 'Outlet wise' worksheet"
         }
@@ -280,9 +1100,236 @@ def process_outlet_wise_worksheet(file_path):
             "traceback": traceback.format_exc()
         }
 
-def process_multi_worksheet_outlets(file_path, outlet_sheets):
+def extract_outlet_sheet(sheet_name, df_raw, required_metrics=REQUIRED_METRICS):
+    """
+    Extract one outlet record from a single outlet worksheet grid (read with no header).
+    Returns None when the sheet holds no usable outlet data.
+    """
+    # Find the header row containing "Particulars"
+    with timed_stage("detect_header"):
+        hdr_row, part_col = detect_header(df_raw)
+    print(f"[INFO] Header found at row {hdr_row}, column {part_col} for {sheet_name}")
+
+    # Extract outlet name and manager from the sheet
+    # Look for outlet name in the first few rows
+    outlet_name = ""
+    manager_name = ""
+    month = "June-25"  # Default month, can be extracted from sheet if needed
+
+    # Try to find outlet name and manager in the first few rows
+    for row_idx in range(min(5, df_raw.shape[0])):
+        for col_idx in range(min(5, df_raw.shape[1])):
+            cell_value = str(df_raw.iloc[row_idx, col_idx]).strip()
+            if cell_value and cell_value != 'nan' and cell_value != 'None':
+                # Look for outlet name patterns
+                if any(keyword in cell_value.lower() for keyword in ['mg', 'nagar', 'layout', 'road', 'club', 'paakashaala', 'nagar', 'layout']):
+                    outlet_name = cell_value
+                # Look for manager name patterns (contains numbers and names)
+                elif any(char.isdigit() for char in cell_value) and any(char.isalpha() for char in cell_value):
+                    if '-' in cell_value:
+                        manager_name = cell_value.split('-', 1)[1].strip()
+                    else:
+                        manager_name = cell_value
+
+    # If we couldn't find outlet name, use sheet name
+    if not outlet_name:
+        outlet_name = sheet_name
+
+    # If we couldn't find manager name, use sheet name
+    if not manager_name:
+        manager_name = sheet_name
+
+    print(f"[INFO] Extracted - Outlet: {outlet_name}, Manager: {manager_name}")
+
+    # Process the financial data from this sheet
+    df_after = df_raw.iloc[hdr_row:, :].copy()
+
+    # Check if we have enough rows
+    if df_after.shape[0] < 2:
+        print(f"[WARNING] Not enough data rows in sheet {sheet_name}")
+        return None
+
+    # Set column names from first row
+    df_after.columns = df_after.iloc[0]
+    df_after = df_after.iloc[1:].reset_index(drop=True)
+
+    # Check if 'Particulars' column exists
+    if 'Particulars' not in df_after.columns:
+        print(f"[WARNING] 'Particulars' column not found in sheet {sheet_name}")
+        return None
+
+    # Filter to get only the required metrics
+    df_after["Particulars"] = df_after["Particulars"].astype(str).apply(norm_str)
+    df_metrics = df_after[df_after["Particulars"].isin(required_metrics)].reset_index(drop=True)
+
+    if df_metrics.empty:
+        print(f"[WARNING] No required metrics found in sheet {sheet_name}")
+        return None
+
+    # Extract the financial values (usually in the first data column after Particulars)
+    # Look for the first column with numeric data
+    data_column = None
+    for col in df_metrics.columns[1:]:
+        if col != "Particulars" and col is not None:
+            # Check if this column has numeric data
+            try:
+                numeric_values = pd.to_numeric(df_metrics[col], errors='coerce')
+                if not numeric_values.isna().all() and numeric_values.sum() > 0:
+                    data_column = col
+                    break
+            except:
+                continue
+
+    if data_column is None:
+        print(f"[WARNING] No numeric data column found in sheet {sheet_name}")
+        print(f"[DEBUG] Available columns: {list(df_metrics.columns)}")
+        return None
+
+    # Create outlet record
+    outlet_record = {
+        "Outlet": outlet_name,
+        "Outlet Manager": manager_name,
+        "Month": month
+    }
+
+    # Extract each metric value
+    for _, row in df_metrics.iterrows():
+        metric_name = row["Particulars"]
+        metric_value = pd.to_numeric(row[data_column], errors='coerce')
+        if not pd.isna(metric_value):
+            outlet_record[metric_name] = float(metric_value)
+        else:
+            outlet_record[metric_name] = 0.0
+
+    # Ensure all required metrics are present
+    for metric in required_metrics:
+        if metric not in outlet_record:
+            outlet_record[metric] = 0.0
+
+    return outlet_record
+
+# Process pools start their workers from a fork server (a fresh interpreter with this module
+# preloaded) instead of forking the server: a fork of a process running request threads can
+# hand the child a lock (e.g. stdout's) that another thread was holding. Spawn where there
+# is no fork server (Windows).
+PROCESS_POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+if PROCESS_POOL_CONTEXT.get_start_method() == "forkserver":
+    PROCESS_POOL_CONTEXT.set_forkserver_preload(["backend_api"])
+
+def process_pool(max_workers):
+    """ProcessPoolExecutor with 'max_workers' workers started from PROCESS_POOL_CONTEXT."""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=PROCESS_POOL_CONTEXT)
+
+def _extract_outlet_sheet_job(job):
     """
-    Process multi-worksheet outlet files where each outlet has its own sheet
+    Process-pool entry point: (sheet_name, df_raw) -> (outlet_record, error message).
+    Errors are returned rather than raised so one bad sheet does not abort the batch.
+    """
+    sheet_name, df_raw = job
+    try:
+        print(f"[INFO] Processing outlet sheet: {sheet_name}")
+        return extract_outlet_sheet(sheet_name, df_raw), None
+    except Exception as e:
+        return None, str(e)
+
+def iter_outlet_sheet_records(session, outlet_sheets, max_workers=None):
+    """
+    Yield (sheet_name, outlet_record, error) for each outlet sheet, always in 'outlet_sheets'
+    order and as soon as that sheet has been extracted. Grids are loaded from 'session' one
+    sheet at a time, so the session must stay open while iterating. With max_workers > 1
+    each loaded sheet is handed to a process pool at once, overlapping extraction with
+    loading of the next sheets.
+    """
+    max_workers = OUTLET_SHEET_WORKERS if max_workers is None else max_workers
+    present = [name for name in outlet_sheets if name in session.sheet_names]
+
+    def load(sheet_name):
+        with timed_stage("load_sheets"):
+            return session.raw_frame(sheet_name)
+
+    def missing(sheet_name):
+        return sheet_name, None, f"Worksheet named '{sheet_name}' not found"
+
+    if max_workers <= 1 or len(present) <= 1:
+        for sheet_name in outlet_sheets:
+            if sheet_name not in present:
+                yield missing(sheet_name)
+                continue
+            df_raw = load(sheet_name)
+            with timed_stage("extract_sheets"):
+                outlet_record, error = _extract_outlet_sheet_job((sheet_name, df_raw))
+            yield sheet_name, outlet_record, error
+        return
+
+    workers = min(max_workers, len(present))
+    print(f"[INFO] Extracting {len(present)} outlet sheets on {workers} worker processes")
+    with process_pool(workers) as executor:
+        futures = {}  # keyed by position in 'outlet_sheets', which may list a sheet twice
+        next_pos = 0
+
+        def ready(block):
+            # Results in sheet order: those already done, or all of them once 'block' is set
+            nonlocal next_pos
+            while next_pos < len(outlet_sheets):
+                sheet_name = outlet_sheets[next_pos]
+                if next_pos in futures:
+                    future = futures[next_pos]
+                    if not (block or future.done()):
+                        return
+                    with timed_stage("extract_sheets"):
+                        outlet_record, error = future.result()
+                    del futures[next_pos]
+                    yield sheet_name, outlet_record, error
+                elif sheet_name in present:
+                    return  # not loaded yet
+                else:
+                    yield missing(sheet_name)
+                next_pos += 1
+
+        for pos, sheet_name in enumerate(outlet_sheets):
+            if sheet_name in present:
+                futures[pos] = executor.submit(_extract_outlet_sheet_job, (sheet_name, load(sheet_name)))
+                yield from ready(block=False)
+        yield from ready(block=True)
+
+def iter_changed_sheet_records(session, outlet_sheets, max_workers=None):
+    """
+    Like iter_outlet_sheet_records, but only sheets whose fingerprint is not in
+    sheet_result_cache are read and extracted; unchanged sheets reuse their previous result.
+    Returns (number of reused sheets, records iterator).
+    """
+    with timed_stage("fingerprint_sheets"):
+        fingerprints = session.sheet_fingerprints(outlet_sheets)
+    reused = {}
+    for name, fingerprint in fingerprints.items():
+        cached = sheet_result_cache.get((name, fingerprint))
+        if cached is not None:
+            reused[name] = cached
+    changed = [name for name in outlet_sheets if name not in reused]
+    print(f"[INFO] Reusing {len(reused)} unchanged outlet sheets, parsing {len(changed)} new or changed")
+
+    fresh = iter_outlet_sheet_records(session, changed, max_workers)
+
+    def merged():
+        for name in outlet_sheets:
+            if name in reused:
+                outlet_record, error = reused[name]
+            else:
+                _, outlet_record, error = next(fresh)
+                if name in fingerprints:
+                    sheet_result_cache.put((name, fingerprints[name]), (outlet_record, error))
+            yield name, outlet_record, error
+
+    return len(reused), merged()
+
+def process_multi_worksheet_outlets(workbook, outlet_sheets, max_workers=None, response_format="records",
+                                    progress=None):
+    """
+    Process multi-worksheet outlet files where each outlet has its own sheet.
+    'workbook' is a file path or an open WorkbookSession; 'max_workers' > 1 extracts the
+    sheets on a process pool (defaults to OUTLET_SHEET_WORKERS). 'progress', if given,
+    is called as progress(sheets_done, sheets_total) as sheets are extracted.
     """
     try:
         print(f"[INFO] Processing {len(outlet_sheets)} outlet sheets from multi-worksheet file")
@@ -291,141 +1338,29 @@ def process_multi_worksheet_outlets(file_path, outlet_sheets):
         processed_outlets = 0
         failed_outlets = 0
         
-        # Required financial metrics to extract
-        required_metrics = [
-            "Direct Income",
-            "TOTAL REVENUE", 
-            "COGS",
-            "Outlet Expenses",
-            "EBIDTA",
-            "Finance Cost",
-            "01-Bank Charges",
-            "02-Interest on Borrowings",
-            "03-Interest on Vehicle Loan",
-            "04-MG",
-            "PBT",
-            "WASTAGE"
-        ]
+        if progress is not None:
+            progress(0, len(outlet_sheets))
         
-        for sheet_name in outlet_sheets:
-            try:
-                print(f"[INFO] Processing outlet sheet: {sheet_name}")
-                
-                # Read the sheet with no header to preserve raw layout
-                df_raw = pd.read_excel(file_path, sheet_name=sheet_name, header=None, engine='openpyxl')
-                
-                # Find the header row containing "Particulars"
-                hdr_row, part_col = detect_header(df_raw)
-                print(f"[INFO] Header found at row {hdr_row}, column {part_col} for {sheet_name}")
-                
-                # Extract outlet name and manager from the sheet
-                # Look for outlet name in the first few rows
-                outlet_name = ""
-                manager_name = ""
-                month = "June-25"  # Default month, can be extracted from sheet if needed
-                
-                # Try to find outlet name and manager in the first few rows
-                for row_idx in range(min(5, df_raw.shape[0])):
-                    for col_idx in range(min(5, df_raw.shape[1])):
-                        cell_value = str(df_raw.iloc[row_idx, col_idx]).strip()
-                        if cell_value and cell_value != 'nan' and cell_value != 'None':
-                            # Look for outlet name patterns
-                            if any(keyword in cell_value.lower() for keyword in ['mg', 'nagar', 'layout', 'road', 'club', 'paakashaala', 'nagar', 'layout']):
-                                outlet_name = cell_value
-                            # Look for manager name patterns (contains numbers and names)
-                            elif any(char.isdigit() for char in cell_value) and any(char.isalpha() for char in cell_value):
-                                if '-' in cell_value:
-                                    manager_name = cell_value.split('-', 1)[1].strip()
-                                else:
-                                    manager_name = cell_value
-                
-                # If we couldn't find outlet name, use sheet name
-                if not outlet_name:
-                    outlet_name = sheet_name
-                
-                # If we couldn't find manager name, use sheet name
-                if not manager_name:
-                    manager_name = sheet_name
-                
-                print(f"[INFO] Extracted - Outlet: {outlet_name}, Manager: {manager_name}")
-                
-                # Process the financial data from this sheet
-                df_after = df_raw.iloc[hdr_row:, :].copy()
-                
-                # Check if we have enough rows
-                if df_after.shape[0] < 2:
-                    print(f"[WARNING] Not enough data rows in sheet {sheet_name}")
-                    failed_outlets += 1
-                    continue
-                
-                # Set column names from first row
-                df_after.columns = df_after.iloc[0]
-                df_after = df_after.iloc[1:].reset_index(drop=True)
-                
-                # Check if 'Particulars' column exists
-                if 'Particulars' not in df_after.columns:
-                    print(f"[WARNING] 'Particulars' column not found in sheet {sheet_name}")
-                    failed_outlets += 1
-                    continue
-                
-                # Filter to get only the required metrics
-                df_after["Particulars"] = df_after["Particulars"].astype(str).apply(norm_str)
-                df_metrics = df_after[df_after["Particulars"].isin(required_metrics)].reset_index(drop=True)
+        # Load the grids (no header, raw layout) of the sheets that changed since they were
+        # last extracted, one sheet at a time, reporting progress as each one is done
+        with workbook_session(workbook) as session:
+            reused_sheets, records = iter_changed_sheet_records(session, outlet_sheets, max_workers)
+            for sheets_done, (sheet_name, outlet_record, sheet_error) in enumerate(records, 1):
+                if progress is not None:
+                    progress(sheets_done, len(outlet_sheets))
                 
-                if df_metrics.empty:
-                    print(f"[WARNING] No required metrics found in sheet {sheet_name}")
+                if sheet_error is not None:
+                    print(f"[ERROR] Failed to process sheet {sheet_name}: {sheet_error}")
                     failed_outlets += 1
                     continue
                 
-                # Extract the financial values (usually in the first data column after Particulars)
-                # Look for the first column with numeric data
-                data_column = None
-                for col in df_metrics.columns[1:]:
-                    if col != "Particulars" and col is not None:
-                        # Check if this column has numeric data
-                        try:
-                            numeric_values = pd.to_numeric(df_metrics[col], errors='coerce')
-                            if not numeric_values.isna().all() and numeric_values.sum() > 0:
-                                data_column = col
-                                break
-                        except:
-                            continue
-                
-                if data_column is None:
-                    print(f"[WARNING] No numeric data column found in sheet {sheet_name}")
-                    print(f"[DEBUG] Available columns: {list(df_metrics.columns)}")
+                if outlet_record is None:
                     failed_outlets += 1
                     continue
                 
-                # Create outlet record
-                outlet_record = {
-                    "Outlet": outlet_name,
-                    "Outlet Manager": manager_name,
-                    "Month": month
-                }
-                
-                # Extract each metric value
-                for _, row in df_metrics.iterrows():
-                    metric_name = row["Particulars"]
-                    metric_value = pd.to_numeric(row[data_column], errors='coerce')
-                    if not pd.isna(metric_value):
-                        outlet_record[metric_name] = float(metric_value)
-                    else:
-                        outlet_record[metric_name] = 0.0
-                
-                # Ensure all required metrics are present
-                for metric in required_metrics:
-                    if metric not in outlet_record:
-                        outlet_record[metric] = 0.0
-                
                 all_outlet_data.append(outlet_record)
                 processed_outlets += 1
                 print(f"[INFO] Successfully processed {sheet_name} - Revenue: {outlet_record.get('TOTAL REVENUE', 0)}")
-                
-            except Exception as sheet_error:
-                print(f"[ERROR] Failed to process sheet {sheet_name}: {str(sheet_error)}")
-                failed_outlets += 1
-                continue
         
         print(f"[INFO] Multi-worksheet processing complete: {processed_outlets} outlets processed, {failed_outlets} failed")
         
@@ -452,16 +1387,14 @@ def process_multi_worksheet_outlets(file_path, outlet_sheets):
         
         df_final = df_final[required_order].copy()
         
-        # Convert to list of dictionaries for JSON serialization
-        df_final_clean = df_final.replace({np.nan: None})
-        result_data = df_final_clean.to_dict('records')
-        
+        # Serialize for JSON (NaN values become None)
         return {
             "success": True,
-            "data": result_data,
+            **outlet_payload(df_final, response_format),
             "outlets_count": len(df_final),
             "processed_outlets": processed_outlets,
             "failed_outlets": failed_outlets,
+            "reused_sheets": reused_sheets,
             "message": f"Successfully processed {processed_outlets} outlets from {len(outlet_sheets)} worksheets (multi-worksheet format)"
         }
         
@@ -472,78 +1405,188 @@ def process_multi_worksheet_outlets(file_path, outlet_sheets):
             "traceback": traceback.format_exc()
         }
 
-def process_financial_data(file_path):
+# ------------------------------
+# CSV ingestion (pandas C parser, chunked)
+# ------------------------------
+EXCEL_SIGNATURES = (b"PK\x03\x04", b"\xd0\xcf\x11\xe0")  # xlsx (zip), xls (OLE2)
+
+CSV_READ_OPTIONS = {
+    "engine": "c",
+    "encoding": "utf-8-sig",
+    "encoding_errors": "replace",
+    "na_values": sorted(NA_CELL_STRINGS),
+}
+
+def rewind(source):
+    """Seek a stream back to the start (paths are returned unchanged)."""
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source
+
+def is_csv_source(source):
+    """True when 'source' (path or binary stream) is non-empty and not an xlsx/xls file."""
+    if hasattr(source, "read"):
+        head = rewind(source).read(4)
+        rewind(source)
+    else:
+        with open(source, "rb") as f:
+            head = f.read(4)
+    return bool(head) and not head.startswith(EXCEL_SIGNATURES)
+
+def csv_max_fields(source):
+    """Number of fields in the widest CSV row (one pass with the csv module)."""
+    if hasattr(source, "read"):
+        text = TextIOWrapper(rewind(source), encoding="utf-8-sig", errors="replace", newline="")
+        try:
+            return max((len(row) for row in csv.reader(text)), default=0)
+        finally:
+            text.detach()  # leave the upload stream open
+    with open(source, encoding="utf-8-sig", errors="replace", newline="") as text:
+        return max((len(row) for row in csv.reader(text)), default=0)
+
+def csv_chunk_rows(chunk):
+    """
+    (row_idx, values) for the non-empty rows of a chunk read with dtype=object, typed the
+    way stream_cell types worksheet cells: numeric text ('1,234.50') becomes a number (whole
+    floats -> int), blanks and NA strings are NaN, and trailing blank cells are dropped.
+    """
+    values = chunk.to_numpy(dtype=object)
+    filled = pd.notna(values)
+    keep = np.flatnonzero(filled.any(axis=1))
+    values, filled = values[keep], filled[keep]
+
+    for j in np.flatnonzero(filled.any(axis=0)):
+        column = pd.Series(values[:, j])
+        numbers = pd.to_numeric(column.str.strip().str.replace(",", "", regex=False), errors="coerce")
+        mask = numbers.notna().to_numpy()
+        if mask.any():
+            values[mask, j] = [stream_cell(v) for v in numbers[mask].tolist()]
+
+    lengths = filled.shape[1] - np.argmax(filled[:, ::-1], axis=1)
+    for i, row_idx in enumerate(chunk.index[keep]):
+        yield row_idx, values[i, :lengths[i]].tolist()
+
+def iter_csv_rows(source, chunk_rows=None):
+    """
+    Yield (row_idx, values) for every non-empty CSV row, like iter_sheet_rows does for a
+    worksheet. Rows are parsed 'chunk_rows' (default CSV_CHUNK_ROWS) at a time, so memory
+    does not grow with the file.
+    """
+    chunk_rows = CSV_CHUNK_ROWS if chunk_rows is None else chunk_rows
+    next_row = 0
+    try:
+        reader = pd.read_csv(rewind(source), header=None, dtype=object, skip_blank_lines=False,
+                             chunksize=chunk_rows, **CSV_READ_OPTIONS)
+        for chunk in reader:
+            for row_idx, values in csv_chunk_rows(chunk):
+                yield row_idx, values
+            next_row = chunk.index[-1] + 1
+    except pd.errors.ParserError:
+        # A row wider than the first one; re-read with explicit column names from where we were
+        width = csv_max_fields(source)
+        print(f"[INFO] Ragged CSV, re-reading from row {next_row} with {width} columns")
+        reader = pd.read_csv(rewind(source), header=None, names=range(width), dtype=object,
+                             skip_blank_lines=False, chunksize=chunk_rows, **CSV_READ_OPTIONS)
+        for chunk in reader:
+            if chunk.index[-1] < next_row:
+                continue
+            for row_idx, values in csv_chunk_rows(chunk):
+                if row_idx >= next_row:
+                    yield row_idx, values
+
+def process_csv_data(source, response_format="records", progress=None):
+    """
+    Process a CSV export with the same layout detection as workbooks: a clean outlet-based
+    table (outlets as rows) or the raw P&L layout (outlet blocks across columns).
+    Both are read in CSV_CHUNK_ROWS chunks by the C parser.
+    """
+    if progress is not None:
+        progress(0, 1)
+
+    header_cols = list(pd.read_csv(rewind(source), nrows=0, **CSV_READ_OPTIONS).columns)
+    print(f"[DEBUG] Available CSV columns: {header_cols}")
+
+    if is_clean_layout(header_cols):
+        print("[INFO] Detected clean outlet-based CSV")
+        text_cols = {c: str for c in ("Outlet", "Outlet Manager", "Month") if c in header_cols}
+        with timed_stage("read_csv"):
+            chunks = pd.read_csv(rewind(source), dtype=text_cols, thousands=",", chunksize=CSV_CHUNK_ROWS,
+                                 **CSV_READ_OPTIONS)
+            frames = [clean_outlet_table(chunk) for chunk in chunks]
+            df_final = (pd.concat(frames, ignore_index=True) if frames
+                        else clean_outlet_table(pd.DataFrame(columns=header_cols)))
+        return {
+            "success": True,
+            **outlet_payload(df_final, response_format),
+            "outlets_count": len(df_final),
+            "message": f"Successfully processed {len(df_final)} outlet records from clean CSV format"
+        }
+
+    print("[INFO] Trying raw CSV processing...")
+    with timed_stage("stream_csv"):
+        grid = stream_outlet_rows(iter_csv_rows(source))
+    df_final = outlet_table_from_grid(grid)
+    return {
+        "success": True,
+        **outlet_payload(df_final, response_format),
+        "outlets_count": len(df_final),
+        "message": f"Successfully processed {len(df_final)} outlet records from raw CSV format"
+    }
+
+def process_financial_data(file_path, response_format="records", progress=None):
     """
     Process financial data using the logic from data_backend.py
+    'response_format' selects the "data" layout (see outlet_payload); 'progress', if given,
+    is called as progress(sheets_done, sheets_total).
     """
+    session = None
     try:
+        # CSV exports have their own chunked pipeline
+        if is_csv_source(file_path):
+            print("[INFO] Detected CSV upload")
+            return process_csv_data(file_path, response_format, progress)
+
+        # Open the workbook once; every detection path below reads from this session
+        with timed_stage("open_workbook"):
+            session = WorkbookSession(file_path)
+        if progress is not None:
+            progress(0, 1)  # the layouts below parse a single sheet: 1/1 once it is done
+
         # First, check if this file has an "Outlet wise" worksheet (like Outlet PL June-25.xlsx)
         try:
-            # Read all sheet names to check for "Outlet wise" worksheet
-            xl_file = pd.ExcelFile(file_path, engine='openpyxl')
-            sheet_names = xl_file.sheet_names
+            sheet_names = session.sheet_names
             
             print(f"[INFO] Found {len(sheet_names)} worksheets: {sheet_names}")
             
             # Check if "Outlet wise" worksheet exists
             if "Outlet wise" in sheet_names:
                 print("[INFO] Found 'Outlet wise' worksheet, processing it directly")
-                return process_outlet_wise_worksheet(file_path)
+                return process_outlet_wise_worksheet(session, response_format)
             
         except Exception as multi_error:
             print(f"[INFO] Multi-worksheet detection failed, trying single sheet: {multi_error}")
         
         # First, try to read as a clean outlet-based format (like data5.xlsx)
         try:
-            df_clean = pd.read_excel(file_path, engine="openpyxl")
+            # Peek at the header row only; the full sheet is read once the layout is known
+            with timed_stage("detect_layout"):
+                header_cols = session.first_row(0)
             
             # Check if this is already in the clean format (outlets as rows)
             # Also check for financial metrics to ensure it's a complete clean format
-            has_outlet_col = 'Outlet' in df_clean.columns
-            has_manager_col = 'Outlet Manager' in df_clean.columns
-            has_financial_metrics = any(col in df_clean.columns for col in ['TOTAL REVENUE', 'Direct Income', 'COGS', 'EBIDTA'])
-            
-            print(f"[DEBUG] Clean format detection: has_outlet_col={has_outlet_col}, has_manager_col={has_manager_col}, has_financial_metrics={has_financial_metrics}")
-            print(f"[DEBUG] Available columns: {list(df_clean.columns)}")
+            print(f"[DEBUG] Available columns: {header_cols}")
             
-            if has_outlet_col and has_manager_col and has_financial_metrics:
+            if is_clean_layout(header_cols):
                 print("[INFO] Detected clean outlet-based format")
+                with timed_stage("read_sheet"):
+                    df_clean = session.header_frame(0)
+                with timed_stage("assemble"):
+                    df_final_filtered = clean_outlet_table(df_clean)
                 
-                # Process the clean format directly
-                df_final = df_clean.copy()
-                
-                # Ensure required columns exist
-                required_columns = [
-                    "Outlet", "Outlet Manager", "Month",
-                    "Direct Income", "TOTAL REVENUE", "COGS", "Outlet Expenses",
-                    "EBIDTA", "Finance Cost", "PBT", "WASTAGE"
-                ]
-                
-                # Add missing columns with NaN values
-                for col in required_columns:
-                    if col not in df_final.columns:
-                        df_final[col] = np.nan
-                
-                # Reorder columns
-                df_final = df_final[required_columns].copy()
-                
-                # Convert numeric columns
-                numeric_cols = [c for c in required_columns if c not in ("Outlet", "Outlet Manager", "Month")]
-                df_final[numeric_cols] = df_final[numeric_cols].apply(pd.to_numeric, errors="coerce")
-                
-                # Filter out only consolidated summary outlets (include all outlets regardless of revenue)
-                df_final_filtered = df_final[
-                    (~df_final['Outlet'].str.contains('consolidated', case=False, na=False))
-                ].copy()
-                
-                # Convert to list of dictionaries for JSON serialization
-                # Replace NaN values with None for proper JSON serialization
-                df_final_clean = df_final_filtered.replace({np.nan: None})
-                result_data = df_final_clean.to_dict('records')
-                
+                # Serialize for JSON (NaN values become None)
                 return {
                     "success": True,
-                    "data": result_data,
+                    **outlet_payload(df_final_filtered, response_format),
                     "outlets_count": len(df_final_filtered),
                     "message": f"Successfully processed {len(df_final_filtered)} outlet records from clean format (includes all outlets regardless of revenue status)"
                 }
@@ -551,279 +1594,1490 @@ def process_financial_data(file_path):
         except Exception as clean_error:
             print(f"[INFO] Clean format failed, trying raw format: {clean_error}")
             print(f"[DEBUG] Clean format error details: {str(clean_error)}")
-            import traceback
             print(f"[DEBUG] Clean format traceback: {traceback.format_exc()}")
         
         # If clean format fails, try the original raw processing logic
         print("[INFO] Trying raw format processing...")
         
-        # Read workbook with NO header (keep raw layout)
-        # For large files, limit the number of rows to process
-        df0 = pd.read_excel(file_path, header=None, engine="openpyxl", nrows=1000)
-        print(f"[INFO] Raw data shape (limited to 1000 rows): {df0.shape}")
-        
-        # Detect header row/column
-        hdr_row, part_col = detect_header(df0)
-        print(f"[INFO] Header detected at row={hdr_row}, particulars_col={part_col}")
+        # Stream the first sheet with NO header (keep raw layout), row by row with no row cap
+        grid = stream_outlet_sheet(session.worksheet(0))
+        df_final = outlet_table_from_grid(grid)
+
+        # Serialize for JSON (NaN values become None)
+        return {
+            "success": True,
+            **outlet_payload(df_final, response_format),
+            "outlets_count": len(df_final),
+            "message": f"Successfully processed {len(df_final)} outlet records from raw format"
+        }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "traceback": traceback.format_exc()
+        }
+    finally:
+        if session is not None:
+            session.close()
 
-        # Rows above header where Outlet/Manager live (adjust if needed)
-        outlet_row  = max(hdr_row - 1, 0)   # often the outlet names
-        manager_row = max(hdr_row - 3, 0)   # often the managers
+# ------------------------------
+# Upload result cache
+# ------------------------------
+class ResultCache:
+    """
+    Thread-safe LRU cache of serialized JSON responses keyed by upload content hash,
+    bounded by both entry count and total bytes.
+    """
 
-        # Build headered DataFrame from hdr_row
-        df_after = df0.iloc[hdr_row:, :].copy()
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        if self.max_entries <= 0 or len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = body
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
 
-        # Build a parallel array of original column indices
-        orig_idx_full = np.arange(df0.shape[1])
-        orig_idx_after = orig_idx_full.copy()
+result_cache = ResultCache(RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES)
 
-        # Set header from the first row of df_after
-        df_after.columns = df_after.iloc[0]
-        df_after = df_after.iloc[1:].reset_index(drop=True)
+class SheetResultCache:
+    """Thread-safe LRU of per-sheet extraction results, keyed by (sheet name, fingerprint)."""
 
-        # Slice columns from 'Particulars' **by position**
-        df_after = df_after.iloc[:, part_col:].copy()
-        orig_idx_after = orig_idx_after[part_col:]  # keep the same slice for the index map
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
 
-        # Rename first column to 'Particulars'
-        new_cols = list(df_after.columns)
-        new_cols[0] = "Particulars"
-        df_after.columns = new_cols
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
 
-        # Compute a mask of entirely empty columns (over the data area)
-        # Be more conservative - only remove columns that are completely empty AND don't have month patterns
-        empty_cols_mask = df_after.isna().all(axis=0).values
-        
-        # Additional check: don't remove columns that might be outlet columns (have month patterns)
-        month_re = re.compile(r"^[A-Za-z]+-\d{2}(?:\.\d+)?$")
-        pct_re = re.compile(r"^%(?:\.\d+)?$")
-        
-        for i, col in enumerate(df_after.columns):
-            if empty_cols_mask[i]:  # If column is empty
-                col_name = norm_str(col)
-                # Don't remove if it looks like a month column or % column
-                if month_re.match(col_name) or pct_re.match(col_name):
-                    empty_cols_mask[i] = False
-        
-        # Apply the same mask to BOTH df_after and the index map
-        df_after = df_after.loc[:, ~empty_cols_mask].copy()
-        orig_idx_after = orig_idx_after[~empty_cols_mask]
-
-        print(f"[INFO] After filtering empty columns: {df_after.shape}")
-
-        # Filter required metrics
-        required_rows = [
-            "Direct Income",
-            "TOTAL REVENUE",
-            "COGS",
-            "Outlet Expenses",
-            "EBIDTA",
-            "Finance Cost",
-            "01-Bank Charges",
-            "02-Interest on Borrowings",
-            "03-Interest on Vehicle Loan",
-            "04-MG",
-            "PBT",
-            "WASTAGE",
-        ]
-        
-        # Additional interest-related metrics for better analysis
-        interest_metrics = [
-            "01-Bank Charges",
-            "02-Interest on Borrowings", 
-            "03-Interest on Vehicle Loan",
-            "04-MG",
-            "Finance Cost"
-        ]
-        df_after["Particulars"] = df_after["Particulars"].astype(str).apply(norm_str)
-        df_req = df_after[df_after["Particulars"].isin(required_rows)].reset_index(drop=True)
-        
-        print(f"[INFO] Found {len(df_req)} required metric rows")
-        
-        if df_req.empty:
-            print("DEBUG — Available 'Particulars' values (first 30):")
-            available_particulars = df_after["Particulars"].dropna().unique()[:30]
-            print(available_particulars)
-            
-            # Try to find similar matches
-            print("DEBUG — Looking for similar matches...")
-            for req_row in required_rows:
-                matches = [p for p in available_particulars if req_row.lower() in str(p).lower()]
-                if matches:
-                    print(f"  '{req_row}' might match: {matches}")
-            
-            raise ValueError("None of the required rows were found under 'Particulars'.")
-
-        # Detect all outlet (Month, %) column pairs by **position** - AFTER filtering
-        cols = list(df_after.columns)  # Use df_after (after empty column filtering) instead of df_req
-        month_re = re.compile(r"^[A-Za-z]+-\d{2}(?:\.\d+)?$")
-        pct_re   = re.compile(r"^%(?:\.\d+)?$")
-
-        outlet_blocks = []
-        for i in range(1, len(cols) - 1):  # 0 is 'Particulars'
-            cname = norm_str(cols[i])
-            nname = norm_str(cols[i+1])
-            if month_re.match(cname) and (nname == "%" or pct_re.match(nname)):
-                outlet_blocks.append((i, cols[i], cols[i+1]))
-
-        print(f"[INFO] Found {len(outlet_blocks)} outlet blocks")
-
-        if not outlet_blocks:
-            print("DEBUG — Columns after 'Particulars':", cols[:20], " ... total:", len(cols))
-            print("DEBUG — Looking for month patterns...")
-            for i, col in enumerate(cols[1:6]):  # Check first 5 columns after Particulars
-                print(f"  Column {i+1}: '{col}' -> month_match: {bool(month_re.match(norm_str(col)))}")
-            raise ValueError("No Month/% pairs detected (e.g., 'June-25' followed by '%').")
-
-        # Build final rows
-        final_rows = []
-        skipped_count = 0
-
-        for (val_idx, val_col_name, pct_col_name) in outlet_blocks:
-            # Map df_after column position -> original df0 column index
-            # val_idx now corresponds directly to orig_idx_after since we used df_after.columns
-            orig_col_idx = int(orig_idx_after[val_idx])
-
-            # Outlet / Manager via robust scanning
-            outlet_name  = get_name(df0, outlet_row,  orig_col_idx, max_up=6, max_dx=2)
-            manager_name = get_name(df0, manager_row, orig_col_idx, max_up=8, max_dx=2)
-
-            # Skip consolidated summary column if it happens to be detected
-            if outlet_name.lower() == "consolidated summary" or "consolidated" in outlet_name.lower():
-                skipped_count += 1
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+sheet_result_cache = SheetResultCache(SHEET_CACHE_MAX_ENTRIES)
+
+class ParseCache:
+    """
+    On-disk cache of parsed outlet tables, one Parquet file per upload keyed by content
+    hash and PARSER_VERSION, so the first upload after a restart skips openpyxl.
+    Entries are written atomically (temp file + os.replace) and the least recently used
+    ones are evicted once the directory grows past 'max_bytes'.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = pq is not None and max_bytes > 0
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+        elif pq is None:
+            print("[INFO] pyarrow not installed, on-disk parse cache disabled")
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}-v{PARSER_VERSION}.parquet")
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get(self, key, response_format="records"):
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            table = pq.read_table(path)
+            result = json.loads(table.schema.metadata[b"result"])
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[WARNING] Dropping unreadable parse cache entry {path}: {e}")
+            self._remove(path)
+            return None
+
+        result.update(outlet_payload(table.to_pandas(), response_format))
+        return result
+
+    def put(self, key, result):
+        """Store a successful parse result; a failed write is logged and skipped, never raised."""
+        if not self.enabled or not result.get("success"):
+            return
+        meta = {k: v for k, v in result.items() if k not in ("data", "columns")}
+        try:
+            table = pa.Table.from_pandas(result_frame(result), preserve_index=False)
+        except (pa.ArrowException, ValueError, TypeError) as e:
+            # e.g. an object column mixing text and numbers
+            print(f"[WARNING] Not caching parse result {key}: {e}")
+            return
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b"result": json.dumps(meta).encode(),
+        })
+
+        # Write to a temp file in the same directory, then atomically move it into place
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            os.close(fd)
+            pq.write_table(table, tmp_path, compression="zstd")
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            print(f"[WARNING] Could not write parse cache entry {key}: {e}")
+            if tmp_path is not None:
+                self._remove(tmp_path)
+            return
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".parquet"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:  # evicted by another worker
                 continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+parse_cache = ParseCache(PARSE_CACHE_DIR, PARSE_CACHE_MAX_BYTES)
+
+def result_frame(result):
+    """DataFrame of a successful parse result's outlet table, in any response layout."""
+    if isinstance(result["data"], pd.DataFrame):
+        return result["data"]
+    df = pd.DataFrame(result["data"], columns=result.get("columns"))
+    df.attrs["month_periods"] = result.get("month_periods") or {}
+    return df
+
+class DatasetStore:
+    """
+    Thread-safe LRU store of parsed outlet tables (typed DataFrames) keyed by dataset_id,
+    so analytics endpoints can work on an upload without the client re-sending its rows.
+    Bounded by entry count; entries idle for longer than 'ttl' seconds expire.
+    """
 
-            # Month label
-            month_label = norm_str(val_col_name)
-            month = month_label.split("-")[0] if "-" in month_label else month_label
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, dataset_id):
+        with self._lock:
+            entry = self._entries.get(dataset_id)
+            if entry is None:
+                return None
+            df, last_used = entry
+            now = time.time()
+            if now - last_used > self.ttl:
+                del self._entries[dataset_id]
+                return None
+            self._entries[dataset_id] = (df, now)
+            self._entries.move_to_end(dataset_id)
+            return df
+
+    def put(self, dataset_id, df):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries.pop(dataset_id, None)
+            self._entries[dataset_id] = (df, time.time())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+dataset_store = DatasetStore(DATASET_STORE_MAX_ENTRIES, DATASET_TTL_SECONDS)
+
+def find_dataset(dataset_id):
+    """
+    The table registered under 'dataset_id' in this process, else rebuilt from the on-disk
+    parse cache (shared by every server worker), else None.
+    """
+    df = dataset_store.get(dataset_id)
+    if df is None and re.fullmatch(r"[0-9a-f]{64}", str(dataset_id)):
+        result = parse_cache.get(dataset_id)
+        if result is not None:
+            df = result_frame(result)
+            dataset_store.put(dataset_id, df)
+    return df
 
-            row = {
-                "Outlet": outlet_name,
-                "Outlet Manager": manager_name,
-                "Month": month
-            }
+# ------------------------------
+# Historical store (SQLite)
+# ------------------------------
+MONTH_NUMBERS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+MONTH_NUMBERS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+MONTH_NUMBERS["sept"] = 9
 
-            # Copy metrics by position
-            for _, req_row in df_req.iterrows():
-                metric = req_row["Particulars"]
-                value  = req_row.iat[val_idx] if val_idx < df_req.shape[1] else np.nan
-                row[metric] = value
+PERIOD_RE = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
 
-            # Note: Zero revenue outlets are now correctly included in calculations
+def month_key(label):
+    """
+    History key for a Month value: 'YYYY-MM' for labels that carry a year ('June-25',
+    'Jun 2025', dates), otherwise None (e.g. 'June').
+    """
+    if label is None:
+        return None
+    if hasattr(label, "year") and hasattr(label, "month"):
+        return f"{label.year:04d}-{label.month:02d}"
+    text = norm_str(label)
+    m = re.fullmatch(r"([A-Za-z]+)[\s\-'/]*(\d{2}|\d{4})", text)
+    if m and m.group(1).lower() in MONTH_NUMBERS:
+        year = int(m.group(2))
+        year = year + 2000 if year < 100 else year
+        return f"{year:04d}-{MONTH_NUMBERS[m.group(1).lower()]:02d}"
+    return None
+
+class HistoryStore:
+    """
+    Opt-in SQLite store of monthly outlet P&L, one row per (outlet, manager, month, metric)
+    with indexes on outlet and month. Months are always stored as YYYY-MM, so outlet rows
+    whose month has no year are not recorded unless the upload names its period. Each
+    upload is upserted in a single transaction, so re-uploading a workbook is idempotent.
+    Disabled when 'path' is empty.
+    """
 
-            final_rows.append(row)
+    SCHEMA = """
+        PRAGMA journal_mode=WAL;
+        CREATE TABLE IF NOT EXISTS outlet_metrics (
+            outlet      TEXT NOT NULL,
+            manager     TEXT NOT NULL DEFAULT '',
+            month       TEXT NOT NULL,
+            metric      TEXT NOT NULL,
+            value       REAL,
+            dataset_id  TEXT,
+            updated_at  REAL NOT NULL,
+            PRIMARY KEY (outlet, manager, month, metric)
+        );
+        CREATE INDEX IF NOT EXISTS idx_outlet_metrics_outlet ON outlet_metrics (outlet);
+        CREATE INDEX IF NOT EXISTS idx_outlet_metrics_month ON outlet_metrics (month);
+    """
 
-        df_final = pd.DataFrame(final_rows)
-        print(f"[INFO] Created {len(df_final)} final outlet records")
-        print(f"[INFO] Skipped {skipped_count} consolidated outlets")
-        print(f"[INFO] Total outlet blocks processed: {len(outlet_blocks)}")
+    UPSERT = """
+        INSERT INTO outlet_metrics (outlet, manager, month, metric, value, dataset_id, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (outlet, manager, month, metric) DO UPDATE SET
+            value = excluded.value,
+            dataset_id = excluded.dataset_id,
+            updated_at = excluded.updated_at
+    """
 
-        # Order + numeric coercion
-        required_order = [
-            "Outlet", "Outlet Manager", "Month",
-            "Direct Income", "TOTAL REVENUE", "COGS", "Outlet Expenses",
-            "EBIDTA", "Finance Cost",
-            "01-Bank Charges", "02-Interest on Borrowings",
-            "03-Interest on Vehicle Loan", "04-MG",
-            "PBT", "WASTAGE"
+    def __init__(self, path):
+        self.path = path
+        self.enabled = bool(path)
+        if self.enabled:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._transaction() as conn:
+                conn.executescript(self.SCHEMA)
+            print(f"[INFO] Recording upload history in {path}")
+
+    @contextmanager
+    def _transaction(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def record(self, df, dataset_id, period=None):
+        """
+        Upsert every metric of every outlet row in 'df'; returns the number of rows written.
+        Months are keyed by 'period', else by df.attrs["month_periods"] or the year in the
+        Month label itself; outlet rows with no year are skipped.
+        """
+        if not self.enabled or df.empty:
+            return 0
+        n = len(df)
+        metrics = [c for c in df.columns if c not in ("Outlet", "Outlet Manager", "Month")]
+        outlets = column_values(df["Outlet"]) if "Outlet" in df.columns else [None] * n
+        managers = column_values(df["Outlet Manager"]) if "Outlet Manager" in df.columns else [None] * n
+        months = column_values(df["Month"]) if "Month" in df.columns else [None] * n
+        values = df[metrics].to_numpy(dtype=float, na_value=np.nan)
+        values = np.where(np.isnan(values), None, values).tolist()
+
+        month_periods = df.attrs.get("month_periods") or {}
+        keys = [period or month_periods.get(month) or month_key(month) for month in months]
+        yearless = sum(1 for outlet, key in zip(outlets, keys) if outlet is not None and key is None)
+        if yearless:
+            print(f"[WARNING] Not recording {yearless} outlet rows with no year in their Month "
+                  f"(upload with ?period=YYYY-MM to record them)")
+
+        now = time.time()
+        rows = [
+            (str(outlet), str(manager or ""), key, metric, value, dataset_id, now)
+            for outlet, manager, key, row_values in zip(outlets, managers, keys, values)
+            if outlet is not None and key is not None
+            for metric, value in zip(metrics, row_values)
         ]
-        for c in required_order:
-            if c not in df_final.columns:
-                df_final[c] = np.nan
-        df_final = df_final[required_order].copy()
+        with self._transaction() as conn:
+            conn.executemany(self.UPSERT, rows)
+        return len(rows)
+
+    def query(self, start=None, end=None, outlet=None, metrics=None):
+        """
+        Outlet-month records {Outlet, Outlet Manager, Month, <metric>: value, ...} ordered by
+        month (YYYY-MM). 'start'/'end' are inclusive YYYY-MM bounds.
+        """
+        clauses, params = [], []
+        if start:
+            clauses.append("month >= ?")
+            params.append(start)
+        if end:
+            clauses.append("month <= ?")
+            params.append(end)
+        if outlet:
+            clauses.append("outlet = ?")
+            params.append(outlet)
+        if metrics:
+            clauses.append(f"metric IN ({', '.join('?' * len(metrics))})")
+            params.extend(metrics)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT outlet, manager, month, metric, value FROM outlet_metrics{where} ORDER BY month, outlet, manager"
+
+        records = OrderedDict()
+        with self._transaction() as conn:
+            for outlet_name, manager, month, metric, value in conn.execute(sql, params):
+                key = (outlet_name, manager, month)
+                if key not in records:
+                    records[key] = {"Outlet": outlet_name, "Outlet Manager": manager, "Month": month}
+                records[key][metric] = value
+        return list(records.values())
+
+history_store = HistoryStore(HISTORY_DB_PATH)
+
+def cached_json_response(body, cache_status, content_hash):
+    response = app.response_class(body, mimetype='application/json')
+    response.headers['X-Cache'] = cache_status
+    response.headers['X-Content-SHA256'] = content_hash
+    return response
+
+def hash_upload(file):
+    """
+    Return the SHA-256 hex digest of an uploaded file's bytes, and rewind its stream for
+    parsing. Streams buffered by UploadRequest were hashed while the request was read;
+    any other stream is read once more.
+    """
+    stream = file.stream
+    if hasattr(stream, "sha256"):
+        stream.seek(0)
+        return stream.sha256.hexdigest()
+    digest = hashlib.sha256()
+    if isinstance(stream, BytesIO):
+        with stream.getbuffer() as view:
+            digest.update(view)
+    else:
+        stream.seek(0)
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+def detach_upload(file):
+    """
+    Copy an upload's buffered stream into one the caller owns, for work that outlives the
+    request (werkzeug closes request file streams once the response is sent).
+    """
+    stream = file.stream
+    if isinstance(stream, BytesIO):
+        return BytesIO(stream.getvalue())
+    copy = tempfile.TemporaryFile("wb+", dir=UPLOAD_FOLDER)
+    stream.seek(0)
+    shutil.copyfileobj(stream, copy, UPLOAD_CHUNK_SIZE)
+    copy.seek(0)
+    return copy
 
-        num_cols = [c for c in required_order if c not in ("Outlet", "Outlet Manager", "Month")]
-        df_final[num_cols] = df_final[num_cols].apply(pd.to_numeric, errors="coerce")
+# ------------------------------
+# Background parse jobs
+# ------------------------------
+def process_alive(pid):
+    """True unless 'pid' is known not to be a running process on this host."""
+    if os.name == "nt":  # os.kill would terminate the process on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+class JobStore:
+    """
+    Runs jobs on a bounded thread pool and tracks their status, progress and result.
+    At most 'max_pending' jobs may be queued or running at once; finished jobs are
+    dropped 'ttl' seconds after they complete. With a 'directory', every job record is
+    also written there as <job_id>.json, so jobs run by another server worker can be read.
+    Those files carry the owner's pid and a heartbeat refreshed every 'heartbeat_seconds',
+    so jobs orphaned by a recycled or killed worker are reported as failed, not running.
+    Disabled (no jobs accepted) when 'workers' is 0.
+    """
 
-        # Convert to list of dictionaries for JSON serialization
-        # Replace NaN values with None for proper JSON serialization
-        df_final_clean = df_final.replace({np.nan: None})
-        result_data = df_final_clean.to_dict('records')
-        
-        return {
-            "success": True,
-            "data": result_data,
-            "outlets_count": len(df_final),
-            "message": f"Successfully processed {len(df_final)} outlet records from raw format"
-        }
+    def __init__(self, workers, max_pending, ttl, directory=None, heartbeat_seconds=JOB_HEARTBEAT_SECONDS):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.directory = directory
+        self.heartbeat_seconds = heartbeat_seconds
+        self.enabled = workers > 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._executor = (ThreadPoolExecutor(max_workers=workers, thread_name_prefix="parse-job")
+                          if self.enabled else None)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # keeps a job's file writes in order
+        self._heartbeat = None
+
+    def _path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _save(self, job_id):
+        """Write the job's current record to its file."""
+        if not self.directory:
+            return
+        with self._save_lock:
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return
+                job = {**job, "progress": dict(job["progress"])}
+            self._write(job_id, job)
+
+    def _write(self, job_id, job):
+        """Write a job record with this process's pid and heartbeat (temp file + os.replace)."""
+        body = json.dumps({**job, "owner_pid": os.getpid(), "heartbeat_at": time.time()}, default=str)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(body)
+            os.replace(tmp_path, self._path(job_id))
+        except OSError as e:
+            print(f"[WARNING] Could not save job {job_id}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _load(self, job_id):
+        """
+        A job record written by any worker, or None if unknown or expired. An unfinished
+        record whose owner has stopped is marked failed (and expires after 'ttl').
+        """
+        if not self.directory or not re.fullmatch(r"[0-9a-f]{32}", job_id):
+            return None
+        try:
+            with open(self._path(job_id)) as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        owner_pid, heartbeat_at = job.pop("owner_pid", None), job.pop("heartbeat_at", None) or 0
+        now = time.time()
+        if job["expires_at"] is not None and job["expires_at"] <= now:
+            self._remove_file(job_id)
+            return None
+        if job["finished_at"] is None and (now - heartbeat_at > 3 * self.heartbeat_seconds
+                                           or (owner_pid is not None and not process_alive(owner_pid))):
+            print(f"[WARNING] Job {job_id} was orphaned by worker {owner_pid}, marking it failed")
+            job.update(
+                status="failed",
+                result={"success": False,
+                        "error": "Job interrupted: the server worker running it stopped before it finished"},
+                finished_at=now,
+                expires_at=now + self.ttl,
+            )
+            self._write(job_id, job)
+        return job
+
+    def _remove_file(self, job_id):
+        try:
+            os.remove(self._path(job_id))
+        except OSError:
+            pass
+
+    def _start_heartbeat(self):
+        # Started on first use, in the process that runs the jobs (threads don't survive a fork)
+        if self.directory and self._heartbeat is None:
+            self._heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def _beat(self):
+        """Refresh this process's unfinished job records, and sweep other workers' stale ones."""
+        while True:
+            time.sleep(self.heartbeat_seconds)
+            try:
+                with self._lock:
+                    unfinished = [job_id for job_id, job in self._jobs.items() if job["finished_at"] is None]
+                for job_id in unfinished:
+                    self._save(job_id)
+                for entry in os.scandir(self.directory):
+                    job_id = entry.name[:-len(".json")]
+                    if entry.name.endswith(".json") and job_id not in self._jobs:
+                        self._load(job_id)  # drops expired records, fails orphaned ones
+            except Exception as e:
+                print(f"[WARNING] Job heartbeat failed: {e}")
+
+    def submit(self, fn, *args):
+        """
+        Queue fn(progress, *args), where progress(sheets_done, sheets_total) reports
+        progress and fn returns the result dict. Returns the job id, or None when full.
+        """
+        with self._lock:
+            self._purge()
+            pending = sum(1 for job in self._jobs.values() if job["status"] in ("queued", "running"))
+            if pending >= self.max_pending:
+                return None
+            self._start_heartbeat()
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "progress": {"sheets_done": 0, "sheets_total": None},
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "expires_at": None,
+                "result": None,
+            }
+        self._save(job_id)
+        self._executor.submit(self._run, job_id, fn, args)
+        return job_id
 
-    except Exception as e:
-        return {
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+        self._save(job_id)
+
+    def _run(self, job_id, fn, args):
+        self._update(job_id, status="running", started_at=time.time())
+
+        def progress(sheets_done, sheets_total):
+            self._update(job_id, progress={"sheets_done": sheets_done, "sheets_total": sheets_total})
+
+        try:
+            result = fn(progress, *args)
+        except Exception as e:
+            result = {"success": False, "error": str(e), "traceback": traceback.format_exc()}
+
+        finished_at = time.time()
+        with self._lock:
+            job = self._jobs[job_id]
+            if result.get("success"):
+                total = job["progress"]["sheets_total"] or 1
+                job["progress"] = {"sheets_done": total, "sheets_total": total}
+            job.update(
+                status="completed" if result.get("success") else "failed",
+                result=result,
+                finished_at=finished_at,
+                expires_at=finished_at + self.ttl,
+            )
+        self._save(job_id)
+
+    def get(self, job_id):
+        with self._lock:
+            self._purge()
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return {**job, "progress": dict(job["progress"])}
+        return self._load(job_id)
+
+    def _purge(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["expires_at"] is not None and job["expires_at"] <= now]
+        for job_id in expired:
+            del self._jobs[job_id]
+            if self.directory:
+                self._remove_file(job_id)
+
+job_store = JobStore(JOB_WORKERS, JOB_MAX_PENDING, JOB_TTL_SECONDS, JOB_STATE_DIR)
+
+# ------------------------------
+# On-demand request profiling
+# ------------------------------
+class ProfileStore:
+    """
+    pstats dumps of profiled requests, saved as <profile_id>.prof with a <profile_id>.json
+    metadata file. Dumps older than 'max_age' seconds are removed and only the newest
+    'max_files' are kept.
+    """
+
+    def __init__(self, directory, max_files, max_age):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id, suffix):
+        return os.path.join(self.directory, f"{profile_id}{suffix}")
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def save(self, profiler, meta):
+        """Write the profiler's stats atomically and return the new profile id."""
+        profile_id = uuid.uuid4().hex
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            profiler.dump_stats(tmp_path)
+            with open(self._path(profile_id, ".json"), "w") as f:
+                json.dump({"profile_id": profile_id, **meta}, f)
+            os.replace(tmp_path, self._path(profile_id, ".prof"))
+        except Exception:
+            self._remove(tmp_path)
+            raise
+        with self._lock:
+            self._prune()
+        return profile_id
+
+    def list(self):
+        """Metadata of the stored profiles, newest first."""
+        profiles = []
+        if not os.path.isdir(self.directory):
+            return profiles
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".prof"):
+                continue
+            try:
+                with open(entry.path[:-len(".prof")] + ".json") as f:
+                    meta = json.load(f)
+                meta["size_bytes"] = entry.stat().st_size
+            except (OSError, ValueError):  # pruned meanwhile or half-written
+                continue
+            profiles.append(meta)
+        profiles.sort(key=lambda meta: meta.get("created_at", 0), reverse=True)
+        return profiles
+
+    def path(self, profile_id):
+        """Path of a stored dump, or None for unknown (or malformed) ids."""
+        if not re.fullmatch(r"[0-9a-f]{32}", profile_id):
+            return None
+        path = self._path(profile_id, ".prof")
+        return path if os.path.exists(path) else None
+
+    def _prune(self):
+        now = time.time()
+        dumps = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".prof"):
+                continue
+            try:
+                dumps.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+        dumps.sort(reverse=True)
+        for i, (mtime, path) in enumerate(dumps):
+            if i >= self.max_files or now - mtime > self.max_age:
+                self._remove(path)
+                self._remove(path[:-len(".prof")] + ".json")
+
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_MAX_FILES, PROFILE_MAX_AGE_SECONDS)
+
+# cProfile can only have one active profiler per process on newer Pythons
+_profile_lock = threading.Lock()
+
+def profile_token_error():
+    """
+    None when the request carries the valid PROFILE_TOKEN (X-Profile-Token header or
+    profile_token query param), otherwise the error response to return.
+    """
+    if not PROFILE_TOKEN:
+        return jsonify({
             "success": False,
-            "error": str(e),
-            "traceback": traceback.format_exc()
-        }
+            "error": "Profiling is disabled (set PROFILE_TOKEN to enable it)"
+        }), 404
+    token = request.headers.get('X-Profile-Token') or request.args.get('profile_token') or ""
+    if not hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode()):
+        return jsonify({
+            "success": False,
+            "error": "Invalid or missing profile token"
+        }), 403
+    return None
+
+def profiled(view):
+    """
+    Route decorator: requests carrying a profile token run the view under cProfile, and
+    the pstats dump is saved in profile_store under the id returned in X-Profile-Id.
+    Requests without a token are served as usual.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if 'X-Profile-Token' not in request.headers and 'profile_token' not in request.args:
+            return view(*args, **kwargs)
+        error_response = profile_token_error()
+        if error_response is not None:
+            return error_response
+        if not _profile_lock.acquire(blocking=False):
+            return jsonify({
+                "success": False,
+                "error": "Another request is being profiled, try again shortly"
+            }), 409
+
+        try:
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            response = app.make_response(profiler.runcall(view, *args, **kwargs))
+            elapsed = time.perf_counter() - start
+        finally:
+            _profile_lock.release()
+
+        profile_id = profile_store.save(profiler, {
+            "endpoint": request.path,
+            "method": request.method,
+            "status": response.status_code,
+            "duration_seconds": round(elapsed, 4),
+            "created_at": time.time(),
+        })
+        print(f"[INFO] Saved profile {profile_id} for {request.method} {request.path} ({elapsed:.2f}s)")
+        response.headers['X-Profile-Id'] = profile_id
+        return response
+
+    return wrapper
+
+@app.route('/profiles', methods=['GET'])
+def list_profiles():
+    """Recent request profiles (requires the profile token)."""
+    error_response = profile_token_error()
+    if error_response is not None:
+        return error_response
+    profiles = profile_store.list()
+    return jsonify({"success": True, "profiles": profiles, "count": len(profiles)})
+
+@app.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """
+    Download a profile's pstats dump (load it with pstats.Stats or snakeviz), or with
+    ?format=text a report of the top PROFILE_TEXT_LINES functions by cumulative time.
+    """
+    error_response = profile_token_error()
+    if error_response is not None:
+        return error_response
+    path = profile_store.path(profile_id)
+    if path is None:
+        return jsonify({
+            "success": False,
+            "error": "Profile not found or expired"
+        }), 404
+
+    if request.args.get('format') == 'text':
+        report = StringIO()
+        pstats.Stats(path, stream=report).sort_stats("cumulative").print_stats(PROFILE_TEXT_LINES)
+        return app.response_class(report.getvalue(), mimetype='text/plain')
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f"{profile_id}.prof")
+
+def choose_encoding(accept_encodings):
+    """Return 'br' or 'gzip' (highest q-value wins, br on ties), or None if neither is accepted."""
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = max(candidates, key=accept_encodings.quality)
+    return best if accept_encodings.quality(best) > 0 else None
+
+def compress_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+@app.after_request
+def compress_response(response):
+    """
+    Compress JSON/text responses for clients that accept br or gzip. Streamed or
+    already-encoded responses and bodies under COMPRESS_MIN_BYTES are sent as is.
+    Time spent and the compression ratio are reported in a Server-Timing entry.
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    start = time.perf_counter()
+    compressed = compress_body(body, encoding)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    ratio = len(body) / max(len(compressed), 1)
+
+    stage_histogram.observe(elapsed_ms / 1000, "compress")
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    add_server_timing(
+        response,
+        f'compress;dur={elapsed_ms:.1f};desc="{encoding} {len(body)}->{len(compressed)}B ratio {ratio:.1f}x"'
+    )
+    return response
 
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "healthy", "message": "Backend API is running"})
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Parse-stage and request duration histograms in the Prometheus text format.
+    Counters are per process (each server worker exposes its own).
+    """
+    lines = stage_histogram.render() + request_histogram.render()
+    return app.response_class("\n".join(lines) + "\n", content_type="text/plain; version=0.0.4; charset=utf-8")
+
+def upload_from_request(formats=RESPONSE_FORMATS):
+    """
+    Validate the multipart 'file' upload and optional 'format' (one of 'formats') shared by
+    /process-file and /jobs. Returns (file, response_format, None), or
+    (None, None, error_response) on a bad request.
+    """
+    # Check if file is present
+    if 'file' not in request.files:
+        return None, None, (jsonify({
+            "success": False,
+            "error": "No file provided"
+        }), 400)
+
+    file = request.files['file']
+    
+    if file.filename == '':
+        return None, None, (jsonify({
+            "success": False,
+            "error": "No file selected"
+        }), 400)
+
+    if not allowed_file(file.filename):
+        return None, None, (jsonify({
+            "success": False,
+            "error": "File type not allowed. Please upload Excel or CSV files (.xlsx, .xls, .csv)"
+        }), 400)
+
+    # Optional response layout: "records" (default), "columnar", ...
+    response_format = request.args.get('format') or request.form.get('format') or 'records'
+    if response_format not in formats:
+        return None, None, (jsonify({
+            "success": False,
+            "error": f"Unsupported format '{response_format}'. Use one of: {', '.join(formats)}"
+        }), 400)
+
+    return file, response_format, None
+
+def period_from_request():
+    """
+    Optional 'period' (YYYY-MM) an upload's rows are recorded under in the history store.
+    Returns (period, None), or (None, error_response) when it is malformed.
+    """
+    period = request.args.get('period') or request.form.get('period')
+    if period and not PERIOD_RE.match(period):
+        return None, (jsonify({
+            "success": False,
+            "error": f"Invalid period '{period}', expected YYYY-MM"
+        }), 400)
+    return period, None
+
+def record_history(df, dataset_id, period=None):
+    """Append a parsed table to the history store (if enabled); failures are logged, not raised."""
+    if not history_store.enabled:
+        return
+    try:
+        rows = history_store.record(df, dataset_id, period)
+        print(f"[INFO] Recorded {rows} metric rows in upload history")
+    except Exception as e:
+        print(f"[WARNING] Could not record upload history: {e}")
+
+def parse_upload(stream, content_hash, response_format, progress=None, period=None):
+    """
+    Parse an upload stream, going through the on-disk parse cache, and register the
+    table in dataset_store under dataset_id = content hash (added to successful results)
+    and in the history store under 'period'.
+    Returns (result, cache_status) with cache_status 'DISK' or 'MISS'.
+    """
+    result, cache_status = read_upload(stream, content_hash, response_format, progress)
+    store_upload(result, content_hash, cache_status, period)
+    return result, cache_status
+
+def read_upload(stream, content_hash, response_format, progress=None):
+    """The parse half of parse_upload: (result, cache_status), with no writes."""
+    with timed_stage("parse_cache_read"):
+        result = parse_cache.get(content_hash, response_format)
+    if result is not None:
+        return result, 'DISK'
+    # Process the file using our backend logic
+    return process_financial_data(stream, response_format, progress=progress), 'MISS'
+
+def store_upload(result, content_hash, cache_status, period=None):
+    """The write half of parse_upload: parse cache (for a fresh parse), dataset store, history."""
+    if cache_status == 'MISS':
+        with timed_stage("parse_cache_write"):
+            parse_cache.put(content_hash, result)
+    with timed_stage("register_dataset"):
+        register_dataset(result, content_hash, period)
+
+def register_dataset(result, content_hash, period=None):
+    """
+    Register a successful parse result in dataset_store and the history store, and add its
+    dataset_id (the content hash) to the result. Returns the parsed table, or None on failure.
+    """
+    if not result.get("success"):
+        return None
+    df = result_frame(result)
+    dataset_store.put(content_hash, df)
+    record_history(df, content_hash, period)
+    result["dataset_id"] = content_hash
+    return df
+
+def iter_ndjson(result, on_complete=None):
+    """
+    Yield NDJSON lines for a FRAME_FORMAT parse result: one outlet record per line, then a
+    summary line {"summary": true, "processed": ..., "failed": ..., ...}. Records are
+    serialized from the outlet table NDJSON_CHUNK_ROWS rows at a time (with column_values,
+    as in the columnar layout), so no JSON-ready copy of the whole table is ever built.
+    'on_complete', if given, runs after the last record and before the summary line
+    (errors are logged, not streamed).
+    """
+    processed = 0
+    if result.get("success"):
+        df = result["data"]
+        columns = list(df.columns)
+        for start in range(0, len(df), NDJSON_CHUNK_ROWS):
+            chunk = df.iloc[start:start + NDJSON_CHUNK_ROWS]
+            values = [column_values(chunk[col]) for col in columns]
+            for row in zip(*values):
+                yield app.json.dumps(dict(zip(columns, row))) + "\n"
+                processed += 1
+
+    if on_complete is not None:
+        try:
+            on_complete()
+        except Exception as e:
+            print(f"[ERROR] Post-stream processing failed: {e}")
+
+    summary = {k: v for k, v in result.items() if k not in ("columns", "data")}
+    summary.update(summary=True, processed=processed, failed=result.get("failed_outlets", 0))
+    yield app.json.dumps(summary) + "\n"
+
 @app.route('/process-file', methods=['POST'])
+@profiled
 def process_file():
     try:
-        # Check if file is present
-        if 'file' not in request.files:
+        file, response_format, error_response = upload_from_request(RESPONSE_FORMATS + (STREAM_FORMAT,))
+        if error_response is not None:
+            return error_response
+        period, error_response = period_from_request()
+        if error_response is not None:
+            return error_response
+
+        # Parse straight from the buffered upload stream; hash it first for the caches
+        with timed_stage("hash_upload"):
+            content_hash = hash_upload(file)
+
+        if response_format == STREAM_FORMAT:
+            # Parse to the outlet table itself (shares the parse cache) and stream it row by
+            # row at once; the cache, dataset and history writes run after the last record
+            # (so a client that disconnects early leaves nothing registered)
+            result, cache_status = read_upload(file.stream, content_hash, FRAME_FORMAT)
+            store = functools.partial(store_upload, result, content_hash, cache_status, period)
+            response = app.response_class(iter_ndjson(result, store), mimetype='application/x-ndjson')
+            response.headers['X-Cache'] = cache_status
+            response.headers['X-Content-SHA256'] = content_hash
+            return response
+
+        # Identical uploads are served from the in-memory result cache,
+        # then from the on-disk parse cache (which survives restarts)
+        cache_key = f"{content_hash}:{response_format}"
+        # (only while its dataset_id is still registered, since the body references it)
+        cached_body = result_cache.get(cache_key)
+        dataset = dataset_store.get(content_hash) if cached_body is not None else None
+        if dataset is not None:
+            record_history(dataset, content_hash, period)
+            return cached_json_response(cached_body, 'HIT', content_hash)
+
+        result, cache_status = parse_upload(file.stream, content_hash, response_format, period=period)
+
+        with timed_stage("json_encode"):
+            body = jsonify(result).get_data()
+        if result.get("success"):
+            result_cache.put(cache_key, body)
+        return cached_json_response(body, cache_status, content_hash)
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"Processing failed: {str(e)}",
+            "traceback": traceback.format_exc()
+        }), 500
+
+def run_parse_job(progress, stream, content_hash, response_format, period=None):
+    """Job body for /jobs: parse a detached upload stream, then close it."""
+    with stream:
+        result, _ = parse_upload(stream, content_hash, response_format, progress, period)
+    return result
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Queue a workbook parse on the background worker pool and return its job id at once.
+    Poll GET /jobs/<job_id> for status, progress and the result. Progress counts parsed
+    sheets; every upload layout is parsed from a single sheet (or CSV), so it goes from
+    0/1 to 1/1.
+
+    Jobs run in the server worker that accepted them: if that worker is recycled (gunicorn
+    max_requests) or killed mid-job, the job is reported as failed and must be resubmitted.
+    """
+    if not job_store.enabled:
+        return jsonify({
+            "success": False,
+            "error": "Background jobs are disabled (set JOB_WORKERS to enable them)"
+        }), 404
+
+    try:
+        file, response_format, error_response = upload_from_request()
+        if error_response is not None:
+            return error_response
+        period, error_response = period_from_request()
+        if error_response is not None:
+            return error_response
+
+        content_hash = hash_upload(file)
+        stream = detach_upload(file)
+        job_id = job_store.submit(run_parse_job, stream, content_hash, response_format, period)
+        if job_id is None:
+            stream.close()
             return jsonify({
                 "success": False,
-                "error": "No file provided"
-            }), 400
+                "error": f"Too many pending jobs (limit {job_store.max_pending}), try again later"
+            }), 503
 
-        file = request.files['file']
-        
-        if file.filename == '':
-            return jsonify({
+        response = jsonify({
+            "success": True,
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/jobs/{job_id}"
+        })
+        response.status_code = 202
+        response.headers['Location'] = f"/jobs/{job_id}"
+        return response
+
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"Could not create job: {str(e)}",
+            "traceback": traceback.format_exc()
+        }), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({
+            "success": False,
+            "error": "Job not found or expired"
+        }), 404
+    return jsonify({"success": True, **job})
+
+# ------------------------------
+# Batch uploads
+# ------------------------------
+BATCH_ARCHIVE_EXTENSIONS = {'zip'}
+
+def _parse_batch_file_job(job):
+    """
+    Process-pool entry point: (file_name, file_bytes) -> (result, parse_seconds).
+    process_financial_data reports errors in the result dict, so one bad file does not
+    abort the batch.
+    """
+    file_name, data = job
+    print(f"[INFO] Batch: parsing {file_name}")
+    start = time.perf_counter()
+    result = process_financial_data(BytesIO(data), "records")
+    return result, time.perf_counter() - start
+
+def batch_too_large():
+    return jsonify({
+        "success": False,
+        "error": f"Batch too large (limit {BATCH_MAX_FILES} files, {BATCH_MAX_BYTES} bytes)"
+    }), 413
+
+def batch_files_from_request():
+    """
+    Collect (file_name, file_bytes) pairs from the multipart 'files' (and/or 'file') uploads,
+    expanding .zip archives into their Excel/CSV members. Returns (files, None), or
+    (None, error_response) on a bad request.
+    """
+    uploads = request.files.getlist('files') + request.files.getlist('file')
+    uploads = [upload for upload in uploads if upload.filename]
+    if not uploads:
+        return None, (jsonify({
+            "success": False,
+            "error": "No files provided"
+        }), 400)
+
+    files, total_bytes = [], 0
+    for upload in uploads:
+        extension = upload.filename.rsplit('.', 1)[-1].lower() if '.' in upload.filename else ''
+        if extension in BATCH_ARCHIVE_EXTENSIONS:
+            try:
+                archive = zipfile.ZipFile(upload.stream)
+            except zipfile.BadZipFile:
+                return None, (jsonify({
+                    "success": False,
+                    "error": f"'{upload.filename}' is not a valid ZIP archive"
+                }), 400)
+            with archive:
+                members = [info for info in archive.infolist()
+                           if not info.is_dir() and not info.filename.startswith('__MACOSX/')
+                           and allowed_file(os.path.basename(info.filename))]
+                total_bytes += sum(info.file_size for info in members)
+                # Checked before extracting anything, against the members' uncompressed sizes
+                if total_bytes > BATCH_MAX_BYTES or len(files) + len(members) > BATCH_MAX_FILES:
+                    return None, batch_too_large()
+                files.extend((f"{upload.filename}/{info.filename}", archive.read(info)) for info in members)
+        elif allowed_file(upload.filename):
+            upload.stream.seek(0)
+            data = upload.stream.read()
+            total_bytes += len(data)
+            files.append((upload.filename, data))
+        else:
+            return None, (jsonify({
                 "success": False,
-                "error": "No file selected"
-            }), 400
+                "error": f"File type not allowed for '{upload.filename}'. "
+                         f"Please upload Excel, CSV or ZIP files (.xlsx, .xls, .csv, .zip)"
+            }), 400)
+
+        if total_bytes > BATCH_MAX_BYTES or len(files) > BATCH_MAX_FILES:
+            return None, batch_too_large()
+
+    if not files:
+        return None, (jsonify({
+            "success": False,
+            "error": "No Excel or CSV files found in the upload"
+        }), 400)
+    return files, None
+
+def parse_batch(files, max_workers=None):
+    """
+    Parse (file_name, file_bytes) pairs, going through the on-disk parse cache. Files not
+    cached are parsed concurrently on a process pool (identical files only once).
+    Returns {content_hash: (result, cache_status, parse_seconds)}.
+    """
+    max_workers = BATCH_WORKERS if max_workers is None else max_workers
+    parsed, misses = {}, {}
+    for file_name, data in files:
+        content_hash = hashlib.sha256(data).hexdigest()
+        if content_hash in parsed or content_hash in misses:
+            continue
+        start = time.perf_counter()
+        result = parse_cache.get(content_hash, "records")
+        if result is not None:
+            parsed[content_hash] = (result, 'DISK', time.perf_counter() - start)
+        else:
+            misses[content_hash] = (file_name, data)
+
+    jobs = list(misses.values())
+    if max_workers > 1 and len(jobs) > 1:
+        workers = min(max_workers, len(jobs))
+        print(f"[INFO] Batch: parsing {len(jobs)} files on {workers} worker processes")
+        with process_pool(workers) as executor:
+            results = list(executor.map(_parse_batch_file_job, jobs))
+    else:
+        results = [_parse_batch_file_job(job) for job in jobs]
 
-        if not allowed_file(file.filename):
+    for content_hash, (result, parse_seconds) in zip(misses, results):
+        parse_cache.put(content_hash, result)
+        parsed[content_hash] = (result, 'MISS', parse_seconds)
+    return parsed
+
+@app.route('/batch-process', methods=['POST'])
+def batch_process():
+    """
+    Parse several workbooks/CSVs in one request: multipart 'files' (repeatable), or ZIP
+    archives of them. Returns one merged outlet table with a 'Source File' column, plus
+    per-file status, dataset_id and timings under "files".
+    """
+    try:
+        start = time.perf_counter()
+        files, error_response = batch_files_from_request()
+        if error_response is not None:
+            return error_response
+
+        response_format = request.args.get('format') or request.form.get('format') or 'records'
+        if response_format not in RESPONSE_FORMATS:
             return jsonify({
                 "success": False,
-                "error": "File type not allowed. Please upload Excel files (.xlsx, .xls)"
+                "error": f"Unsupported format '{response_format}'. Use one of: {', '.join(RESPONSE_FORMATS)}"
             }), 400
+        period, error_response = period_from_request()
+        if error_response is not None:
+            return error_response
+
+        with timed_stage("batch_parse"):
+            parsed = parse_batch(files)
+
+        frames, file_statuses = [], []
+        for file_name, data in files:
+            content_hash = hashlib.sha256(data).hexdigest()
+            result, cache_status, parse_seconds = parsed[content_hash]
+            df = register_dataset(result, content_hash, period)
+            status = {
+                "file": file_name,
+                "success": df is not None,
+                "cache": cache_status,
+                "parse_seconds": round(parse_seconds, 4),
+            }
+            if df is not None:
+                frames.append(df.assign(**{"Source File": file_name}))
+                status.update(dataset_id=content_hash, outlets_count=len(df))
+            else:
+                status["error"] = result.get("error", "Unknown error")
+            file_statuses.append(status)
+
+        merged = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["Source File"])
+        merged = merged[["Source File"] + [col for col in merged.columns if col != "Source File"]]
+        files_failed = sum(1 for status in file_statuses if not status["success"])
+        elapsed = time.perf_counter() - start
+        print(f"[INFO] Batch: {len(files)} files, {files_failed} failed, {len(merged)} outlet records "
+              f"in {elapsed:.2f}s")
 
-        # Save uploaded file temporarily
-        filename = secure_filename(file.filename)
-        temp_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(temp_path)
+        return jsonify({
+            "success": bool(frames),
+            **outlet_payload(merged, response_format),
+            "files": file_statuses,
+            "files_processed": len(files) - files_failed,
+            "files_failed": files_failed,
+            "outlets_count": len(merged),
+            "elapsed_seconds": round(elapsed, 4),
+            "message": f"Processed {len(files) - files_failed} of {len(files)} files "
+                       f"({len(merged)} outlet records)"
+        })
 
-        try:
-            # Process the file using our backend logic
-            result = process_financial_data(temp_path)
-            
-            # Clean up temporary file
-            try:
-                os.remove(temp_path)
-            except PermissionError:
-                # File might be in use, try to delete it later
-                print(f"[WARNING] Could not delete temporary file {temp_path} - file may be in use")
-            
-            return jsonify(result)
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"Batch processing failed: {str(e)}",
+            "traceback": traceback.format_exc()
+        }), 500
 
-        except Exception as e:
-            # Clean up temporary file on error
-            try:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-            except PermissionError:
-                print(f"[WARNING] Could not delete temporary file {temp_path} - file may be in use")
-            raise e
+@app.route('/history', methods=['GET'])
+def history():
+    """
+    Query the historical store: ?start=YYYY-MM&end=YYYY-MM&outlet=...&metric=...&metric=...
+    Returns outlet-month records in the same shape as /process-file rows.
+    """
+    if not history_store.enabled:
+        return jsonify({
+            "success": False,
+            "error": "History store is disabled (set HISTORY_DB_PATH to enable it)"
+        }), 404
 
+    start, end = request.args.get('start'), request.args.get('end')
+    for bound in (start, end):
+        if bound and not PERIOD_RE.match(bound):
+            return jsonify({
+                "success": False,
+                "error": f"Invalid month '{bound}', expected YYYY-MM"
+            }), 400
+
+    try:
+        records = history_store.query(start=start, end=end, outlet=request.args.get('outlet'),
+                                      metrics=request.args.getlist('metric'))
+        return jsonify({
+            "success": True,
+            "data": records,
+            "count": len(records)
+        })
     except Exception as e:
         return jsonify({
             "success": False,
-            "error": f"Processing failed: {str(e)}",
+            "error": f"History query failed: {str(e)}",
             "traceback": traceback.format_exc()
         }), 500
 
+# Finance-cost rows summed by /interest-analysis
+INTEREST_METRICS = [
+    '01-Bank Charges',
+    '02-Interest on Borrowings',
+    '03-Interest on Vehicle Loan',
+    '04-MG',
+    'Finance Cost'
+]
+
+def parseFloat(value):
+    """Helper function to parse float values"""
+    try:
+        return float(value) if value is not None else 0.0
+    except:
+        return 0.0
+
+def parse_float_matrix(rows, keys):
+    """
+    parseFloat(row.get(key, 0)) for every row and key, as an (n_rows, n_keys) float64 matrix.
+    Numbers, numeric strings and None convert in one np.array call; any other value sends
+    the matrix through parseFloat cell by cell. None, NaN and unparseable values become 0.
+    """
+    cells = [[row.get(key, 0) for key in keys] for row in rows]
+    try:
+        matrix = np.array(cells, dtype=float).reshape(len(rows), len(keys))
+    except (TypeError, ValueError):
+        matrix = np.array([[parseFloat(v) for v in row] for row in cells], dtype=float).reshape(len(rows), len(keys))
+    matrix[np.isnan(matrix)] = 0.0
+    return matrix
+
+def interest_analysis_payload(financial_data):
+    """Interest cost analysis of outlet rows (list of dicts), each field parsed once."""
+    matrix = parse_float_matrix(financial_data, INTEREST_METRICS + ['TOTAL REVENUE'])
+    outlets = [row.get('Outlet', 'Unknown') for row in financial_data]
+    managers = [row.get('Outlet Manager', 'Unknown') for row in financial_data]
+    return interest_analysis_from_matrix(outlets, managers, matrix)
+
+def dataset_interest_analysis(df):
+    """Interest cost analysis of a stored dataset, reusing its typed columns (missing/NaN = 0)."""
+    keys = INTEREST_METRICS + ['TOTAL REVENUE']
+    matrix = df.reindex(columns=keys).to_numpy(dtype=float, na_value=0.0)
+    outlets = column_values(df['Outlet']) if 'Outlet' in df.columns else ['Unknown'] * len(df)
+    managers = column_values(df['Outlet Manager']) if 'Outlet Manager' in df.columns else ['Unknown'] * len(df)
+    return interest_analysis_from_matrix(outlets, managers, matrix)
+
+def interest_analysis_from_matrix(outlets, managers, matrix):
+    """
+    Interest cost analysis over an outlet x metric matrix (INTEREST_METRICS columns, then
+    TOTAL REVENUE). Totals, outlet counts, averages and per-outlet interest rates are
+    array ops, and outlets are ordered by rate with a stable argsort.
+    """
+    n = len(matrix)
+    amounts, revenue = matrix[:, :-1], matrix[:, -1]
+
+    # Totals per metric; metrics with no positive total are left out of the breakdown
+    totals = amounts.sum(axis=0)
+    outlet_counts = (amounts > 0).sum(axis=0)
+    included = totals > 0
+    interest_breakdown = {
+        metric: {
+            'total_amount': total,
+            'outlet_count': count,
+            'average_amount': total / n
+        }
+        for metric, total, count, keep in zip(INTEREST_METRICS, totals.tolist(), outlet_counts.tolist(), included.tolist())
+        if keep
+    }
+    total_interest = float(totals[included].sum())
+
+    # Interest rates by outlet (0 where there is no positive revenue)
+    outlet_interest = amounts.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        interest_rates = np.where(revenue > 0, outlet_interest / revenue * 100, 0.0)
+
+    # Sort by interest rate for efficiency analysis
+    order = np.argsort(interest_rates, kind='stable')
+    outlet_analysis = [
+        {
+            'outlet': outlets[i],
+            'manager': managers[i],
+            'total_interest': outlet_total,
+            'revenue': outlet_revenue,
+            'interest_rate': rate,
+            'interest_breakdown': dict(zip(INTEREST_METRICS, breakdown))
+        }
+        for i, outlet_total, outlet_revenue, rate, breakdown in zip(
+            order.tolist(), outlet_interest[order].tolist(), revenue[order].tolist(),
+            interest_rates[order].tolist(), amounts[order].tolist())
+    ]
+
+    return {
+        "success": True,
+        "total_interest_costs": total_interest,
+        "interest_breakdown": interest_breakdown,
+        "outlet_analysis": outlet_analysis,
+        "average_interest_rate": float(interest_rates.mean()) if n else 0,
+        "message": f"Interest analysis completed for {n} outlets"
+    }
+
 @app.route('/interest-analysis', methods=['POST'])
+@profiled
 def interest_analysis():
     """
     Endpoint specifically for interest cost analysis
     """
     try:
-        data = request.get_json()
-        if not data or 'financial_data' not in data:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({
+                "success": False,
+                "error": "Request body must be a JSON object"
+            }), 400
+
+        # A dataset_id from /process-file reuses the server-side table instead of raw records
+        if data.get('dataset_id'):
+            df = find_dataset(data['dataset_id'])
+            if df is None:
+                return jsonify({
+                    "success": False,
+                    "error": "Unknown or expired dataset_id, please upload the file again"
+                }), 404
+            with timed_stage("interest_analysis"):
+                analysis = dataset_interest_analysis(df)
+            return jsonify(analysis)
+
+        if 'financial_data' not in data:
             return jsonify({
                 "success": False,
                 "error": "No financial data provided"
@@ -831,59 +3085,9 @@ def interest_analysis():
 
         financial_data = data['financial_data']
         
-        # Calculate interest analysis metrics
-        interest_metrics = [
-            '01-Bank Charges',
-            '02-Interest on Borrowings', 
-            '03-Interest on Vehicle Loan',
-            '04-MG',
-            'Finance Cost'
-        ]
-        
-        # Calculate total interest costs
-        total_interest = 0
-        interest_breakdown = {}
-        
-        for metric in interest_metrics:
-            total_amount = sum(parseFloat(item.get(metric, 0)) or 0 for item in financial_data)
-            if total_amount > 0:
-                interest_breakdown[metric] = {
-                    'total_amount': total_amount,
-                    'outlet_count': len([item for item in financial_data if item.get(metric, 0) and parseFloat(item.get(metric, 0)) > 0]),
-                    'average_amount': total_amount / len(financial_data) if financial_data else 0
-                }
-                total_interest += total_amount
-        
-        # Calculate interest rates by outlet
-        outlet_analysis = []
-        for item in financial_data:
-            outlet = item.get('Outlet', 'Unknown')
-            manager = item.get('Outlet Manager', 'Unknown')
-            revenue = parseFloat(item.get('TOTAL REVENUE', 0)) or 0
-            
-            outlet_interest = sum(parseFloat(item.get(metric, 0)) or 0 for metric in interest_metrics)
-            interest_rate = (outlet_interest / revenue * 100) if revenue > 0 else 0
-            
-            outlet_analysis.append({
-                'outlet': outlet,
-                'manager': manager,
-                'total_interest': outlet_interest,
-                'revenue': revenue,
-                'interest_rate': interest_rate,
-                'interest_breakdown': {metric: parseFloat(item.get(metric, 0)) or 0 for metric in interest_metrics}
-            })
-        
-        # Sort by interest rate for efficiency analysis
-        outlet_analysis.sort(key=lambda x: x['interest_rate'])
-        
-        return jsonify({
-            "success": True,
-            "total_interest_costs": total_interest,
-            "interest_breakdown": interest_breakdown,
-            "outlet_analysis": outlet_analysis,
-            "average_interest_rate": sum(item['interest_rate'] for item in outlet_analysis) / len(outlet_analysis) if outlet_analysis else 0,
-            "message": f"Interest analysis completed for {len(financial_data)} outlets"
-        })
+        with timed_stage("interest_analysis"):
+            analysis = interest_analysis_payload(financial_data)
+        return jsonify(analysis)
         
     except Exception as e:
         return jsonify({
@@ -0,0 +1,239 @@
+"""
+Parser Benchmark Suite
+Generates synthetic workbooks (see generate_workbooks.py) and times each parsing stage:
+
+  load       open the workbook and read the sheet cells
+  header     detect_header (clean layout: header-row probe and layout check)
+  blocks     metric-row scan and (Month, %) block detection (outlet-wise only)
+  names      Outlet / Manager lookup above the header (outlet-wise only)
+  assembly   outlet table assembly (multi-sheet: per-sheet extraction)
+  serialize  outlet_payload + JSON encoding
+
+plus the end-to-end parse, with throughput (outlet records/s, MB/s) and the peak traced
+memory of each stage.
+
+Usage:
+  python benchmark_parser.py
+  python benchmark_parser.py --layouts outlet-wise clean --outlets 100 1000 5000 --months 1 12
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows; max RSS is then not reported
+    resource = None
+
+import backend_api as backend
+from generate_workbooks import LAYOUTS, generate_workbook
+
+STAGES = ("load", "header", "blocks", "names", "assembly", "serialize")
+
+def outlet_wise_stages(path):
+    """[(stage, fn)] for the 'Outlet wise' block layout; each fn gets the previous stage's result."""
+    state = {}
+
+    def load(_):
+        state["session"] = backend.WorkbookSession(path)
+        return list(backend.iter_sheet_rows(state["session"].worksheet("Outlet wise")))
+
+    def header(rows):
+        band = [(i, values) for i, values in rows if i < backend.HEADER_SCAN_ROWS]
+        n_cols = max((len(values) for _, values in band), default=0)
+        found = backend.detect_header(backend.rows_frame(band, band[-1][0] + 1 if band else 0, n_cols))
+        return rows, found
+
+    def blocks(found):
+        rows, header = found
+        grid = backend.stream_outlet_rows(rows, header=header)
+        return grid, backend.find_outlet_blocks(grid)
+
+    def names(found):
+        grid, (orig_idx_after, outlet_blocks) = found
+        return grid, orig_idx_after, outlet_blocks, backend.block_name_maps(grid)
+
+    def assembly(found):
+        grid, orig_idx_after, outlet_blocks, (outlet_names, manager_names) = found
+        state["session"].close()
+        df_final, _ = backend.assemble_outlet_blocks(grid, orig_idx_after, outlet_blocks,
+                                                     outlet_names, manager_names)
+        return df_final
+
+    return [("load", load), ("header", header), ("blocks", blocks), ("names", names),
+            ("assembly", assembly), ("serialize", serialize)]
+
+def multi_sheet_stages(path):
+    state = {}
+
+    def load(_):
+        with backend.WorkbookSession(path) as session:
+            state["sheets"] = session.sheet_names[1:]
+            return session.raw_frames(state["sheets"])
+
+    def header(frames):
+        for df_raw in frames.values():
+            backend.detect_header(df_raw)
+        return frames
+
+    def assembly(frames):
+        records = [backend.extract_outlet_sheet(name, frames[name]) for name in state["sheets"]]
+        return backend.pd.DataFrame([record for record in records if record is not None])
+
+    return [("load", load), ("header", header), ("assembly", assembly), ("serialize", serialize)]
+
+def clean_stages(path):
+    state = {}
+
+    def load(_):
+        state["session"] = backend.WorkbookSession(path)
+        return state["session"].header_frame(0)
+
+    def header(df):
+        backend.is_clean_layout(state["session"].first_row(0))
+        state["session"].close()
+        return df
+
+    return [("load", load), ("header", header), ("assembly", backend.clean_outlet_table),
+            ("serialize", serialize)]
+
+def serialize(df):
+    return backend.app.json.dumps(backend.outlet_payload(df))
+
+def end_to_end(layout, path):
+    if layout == "multi-sheet":
+        with backend.WorkbookSession(path) as session:
+            sheets = session.sheet_names[1:]
+        return backend.process_multi_worksheet_outlets(path, sheets, max_workers=0)
+    return backend.process_financial_data(path)
+
+PIPELINES = {
+    "outlet-wise": outlet_wise_stages,
+    "multi-sheet": multi_sheet_stages,
+    "clean": clean_stages,
+}
+
+def run_stages(layout, path, trace_memory=False):
+    """Run one pass of the staged pipeline. Returns ({stage: seconds}, {stage: peak bytes})."""
+    timings, peaks = {}, {}
+    value = None
+    for stage, fn in PIPELINES[layout](path):
+        if trace_memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        value = fn(value)
+        timings[stage] = time.perf_counter() - start
+        if trace_memory:
+            peaks[stage] = tracemalloc.get_traced_memory()[1] - base
+    return timings, peaks
+
+def benchmark(layout, outlets, months, workdir, repeat=3, trace_memory=True):
+    path = os.path.join(workdir, f"{layout}_{outlets}x{months}.xlsx")
+    generate_workbook(layout, path, outlets, months)
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+
+    # Parser logs are part of the real cost but would flood the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        best = None
+        for _ in range(repeat):
+            timings, _ = run_stages(layout, path)
+            if best is None or sum(timings.values()) < sum(best.values()):
+                best = timings
+
+        e2e = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = end_to_end(layout, path)
+            elapsed = time.perf_counter() - start
+            e2e = elapsed if e2e is None else min(e2e, elapsed)
+
+        peaks = {}
+        if trace_memory:
+            tracemalloc.start()
+            try:
+                _, peaks = run_stages(layout, path, trace_memory=True)
+            finally:
+                tracemalloc.stop()
+
+    if not result.get("success"):
+        raise RuntimeError(f"{layout} {outlets}x{months}: {result.get('error')}")
+    records = result["outlets_count"]
+    return {
+        "layout": layout,
+        "outlets": outlets,
+        "months": months,
+        "file_mb": round(size_mb, 3),
+        "records": records,
+        "stage_seconds": {stage: round(seconds, 6) for stage, seconds in best.items()},
+        "stage_peak_mb": {stage: round(peak / (1024 * 1024), 3) for stage, peak in peaks.items()},
+        "end_to_end_seconds": round(e2e, 6),
+        "records_per_second": round(records / e2e, 1) if e2e else None,
+        "mb_per_second": round(size_mb / e2e, 3) if e2e else None,
+    }
+
+def print_report(results):
+    header = f"{'layout':<12} {'outlets':>7} {'months':>6} {'MB':>7} " + \
+             " ".join(f"{stage:>9}" for stage in STAGES) + f" {'e2e ms':>9} {'rec/s':>9} {'MB/s':>7} {'peak MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        stages = " ".join(f"{r['stage_seconds'][stage] * 1000:>9.1f}" if stage in r["stage_seconds"] else f"{'-':>9}"
+                          for stage in STAGES)
+        peak = f"{max(r['stage_peak_mb'].values()):>8.1f}" if r["stage_peak_mb"] else f"{'-':>8}"
+        print(f"{r['layout']:<12} {r['outlets']:>7} {r['months']:>6} {r['file_mb']:>7.2f} {stages} "
+              f"{r['end_to_end_seconds'] * 1000:>9.1f} {r['records_per_second']:>9.0f} "
+              f"{r['mb_per_second']:>7.2f} {peak}")
+    print("(stage columns in ms, best of --repeat runs; peak MB = largest per-stage tracemalloc peak)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the workbook parser on synthetic data")
+    parser.add_argument("--layouts", nargs="+", choices=LAYOUTS, default=list(LAYOUTS))
+    parser.add_argument("--outlets", nargs="+", type=int, default=[10, 100, 1000])
+    parser.add_argument("--months", nargs="+", type=int, default=[1, 12])
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per scenario (best is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    # Measure full parses, not per-sheet cache hits from the previous run
+    backend.sheet_result_cache.max_entries = 0
+
+    print("=" * 60)
+    print("Parser Benchmark")
+    print("=" * 60)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for layout in args.layouts:
+            for outlets in args.outlets:
+                for months in args.months:
+                    try:
+                        result = benchmark(layout, outlets, months, workdir, args.repeat, not args.no_memory)
+                    except ValueError as e:
+                        print(f"- Skipped {layout} {outlets}x{months}: {e}")
+                        continue
+                    print(f"✓ {layout} {outlets}x{months}: {result['end_to_end_seconds'] * 1000:.1f} ms")
+                    results.append(result)
+
+    print()
+    print_report(results)
+    max_rss_mb = None
+    if resource is not None:
+        max_rss_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # KiB on Linux
+        print(f"Process max RSS: {max_rss_mb:.1f} MB")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"results": results, "max_rss_mb": max_rss_mb}, f, indent=2)
+        print(f"✓ Results written to {args.json}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
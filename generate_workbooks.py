@@ -0,0 +1,232 @@
+"""
+Synthetic P&L Workbook Generator
+Writes workbooks in the three layouts process_financial_data handles, at a configurable
+scale, for benchmarks and load tests:
+
+  outlet-wise   'Outlet wise' sheet: one (Month, %) column block per outlet and month
+  multi-sheet   one worksheet per outlet, months as columns
+  clean         one row per outlet and month, metrics as columns
+
+Usage:
+  python generate_workbooks.py outlet-wise --outlets 500 --months 1 -o outlet_wise.xlsx
+"""
+import argparse
+import calendar
+import sys
+
+import numpy as np
+from openpyxl import Workbook
+
+from backend_api import REQUIRED_METRICS
+
+LAYOUTS = ("outlet-wise", "multi-sheet", "clean")
+
+# Excel's column limit; outlet-wise blocks take 3 columns each (Month, %, spacer)
+MAX_SHEET_COLUMNS = 16384
+
+COMPANY_ROWS = [
+    "TRANSACT FOODS LIMITED",
+    "Synthetic P&L generated for benchmarking",
+    "Rs.",
+]
+
+# Detail rows interleaved with the required metrics, as in the real statements
+DETAIL_ROWS = {
+    "Direct Income": ["1-Outlet Sales", "1.1-Counter Sales", "1.2-Online Sales"],
+    "Outlet Expenses": ["01-Outlet Salaries-ISH", "02-Outlet Rent", "03-SPM Consumption"],
+}
+
+# Outlet names carry the keywords extract_outlet_sheet looks for
+AREAS = ["MG Road", "Akshaya Nagar", "HSR Layout", "Club Road", "Jayanagar", "BTM Layout"]
+
+def month_labels(months, start_year=2024, start_month=4):
+    """'April-24', 'May-24', ... for 'months' consecutive months."""
+    labels = []
+    for i in range(months):
+        year, month = divmod(start_month - 1 + i, 12)
+        labels.append(f"{calendar.month_name[month + 1]}-{(start_year + year) % 100:02d}")
+    return labels
+
+def outlet_names(outlets):
+    return [f"{i} {AREAS[i % len(AREAS)]}" for i in range(1, outlets + 1)]
+
+def manager_names(outlets):
+    return [f"{i}-Manager {i}" for i in range(1, outlets + 1)]
+
+def metric_values(rng, n):
+    """{metric: array of n values}, internally consistent (EBIDTA, Finance Cost, PBT)."""
+    revenue = rng.uniform(2e5, 2e6, n).round(2)
+    cogs = (revenue * rng.uniform(0.35, 0.45, n)).round(2)
+    expenses = (revenue * rng.uniform(0.3, 0.45, n)).round(2)
+    finance = {
+        "01-Bank Charges": (revenue * rng.uniform(0.001, 0.01, n)).round(2),
+        "02-Interest on Borrowings": (revenue * rng.uniform(0, 0.02, n)).round(2),
+        "03-Interest on Vehicle Loan": (revenue * rng.uniform(0, 0.01, n)).round(2),
+        "04-MG": (revenue * rng.uniform(0, 0.05, n)).round(2),
+    }
+    finance_cost = sum(finance.values())
+    ebidta = revenue - cogs - expenses
+    values = {
+        "Direct Income": revenue,
+        "TOTAL REVENUE": revenue,
+        "COGS": cogs,
+        "Outlet Expenses": expenses,
+        "EBIDTA": ebidta,
+        "Finance Cost": finance_cost,
+        **finance,
+        "PBT": ebidta - finance_cost,
+        "WASTAGE": (revenue * rng.uniform(0, 0.03, n)).round(2),
+    }
+    return {metric: values[metric] for metric in REQUIRED_METRICS}
+
+def particulars_rows():
+    """Row labels under 'Particulars': (label, metric or None), with blank spacer rows."""
+    rows = []
+    for metric in REQUIRED_METRICS:
+        rows.append((metric, metric))
+        rows.extend((detail, None) for detail in DETAIL_ROWS.get(metric, []))
+        rows.append((None, None))
+    return rows
+
+def write_outlet_wise(path, outlets, months, seed=0):
+    """
+    'Outlet wise' sheet: column B holds 'Particulars', followed by a Consolidated Summary
+    block and one (Month, %, spacer) block per outlet and month. The manager sits 3 rows
+    and the outlet name 1 row above the header row.
+    """
+    n_blocks = outlets * months + 1
+    if 2 + 3 * n_blocks > MAX_SHEET_COLUMNS:
+        raise ValueError(f"{outlets} outlets x {months} months exceeds Excel's {MAX_SHEET_COLUMNS} columns "
+                         f"in the outlet-wise layout (at most {(MAX_SHEET_COLUMNS - 2) // 3 - 1} blocks)")
+
+    rng = np.random.default_rng(seed)
+    labels = month_labels(months)
+    names, managers = outlet_names(outlets), manager_names(outlets)
+    values = metric_values(rng, outlets * months)
+    consolidated = {metric: float(column.sum()) for metric, column in values.items()}
+
+    blocks = [("Consolidated Summary", "", labels[0], consolidated)]
+    for i in range(outlets):
+        for m, label in enumerate(labels):
+            k = i * months + m
+            blocks.append((names[i], managers[i], label,
+                           {metric: float(column[k]) for metric, column in values.items()}))
+
+    def block_row(cells):
+        row = [None, cells[0]]
+        for cell in cells[1:]:
+            row.extend([cell, None, None])
+        return row
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Outlet Summary")
+    ws.append([None, "Summary sheet (ignored by the parser)"])
+    ws = wb.create_sheet("Outlet wise")
+    ws.append(block_row([COMPANY_ROWS[0]] + list(range(n_blocks))))
+    ws.append(block_row([COMPANY_ROWS[1]] + [manager for _, manager, _, _ in blocks]))
+    ws.append(block_row([None] + [None] * n_blocks))
+    ws.append(block_row([COMPANY_ROWS[2]] + [name for name, _, _, _ in blocks]))
+
+    header = [None, "Particulars"]
+    for _, _, label, _ in blocks:
+        header.extend([label, "%", None])
+    ws.append(header)
+    ws.append([])
+
+    for label, metric in particulars_rows():
+        if metric is None:
+            ws.append([None, label])
+            continue
+        row = [None, label]
+        for _, _, _, block_values in blocks:
+            revenue = block_values["TOTAL REVENUE"]
+            value = block_values[metric]
+            row.extend([value, round(value / revenue, 6) if revenue else None, None])
+        ws.append(row)
+    wb.save(path)
+
+def write_multi_sheet(path, outlets, months, seed=0):
+    """
+    One worksheet per outlet ('Outlet 0001', ...): outlet and manager names in the top
+    rows, then a 'Particulars' header with a (Month, %) column pair per month.
+    """
+    rng = np.random.default_rng(seed)
+    labels = month_labels(months)
+    names, managers = outlet_names(outlets), manager_names(outlets)
+    values = metric_values(rng, outlets * months)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Outlet Summary")
+    ws.append([None, "Summary sheet (ignored by the parser)"])
+    for i in range(outlets):
+        ws = wb.create_sheet(f"Outlet {i + 1:04d}")
+        ws.append([None, COMPANY_ROWS[0]])
+        ws.append([None, names[i]])
+        ws.append([None, managers[i]])
+        ws.append([None, COMPANY_ROWS[2]])
+        ws.append([])  # keeps the month headers out of the 5x5 name scan
+        header = [None, "Particulars"]
+        for label in labels:
+            header.extend([label, "%"])
+        ws.append(header)
+        for label, metric in particulars_rows():
+            row = [None, label]
+            if metric is not None:
+                for m in range(months):
+                    k = i * months + m
+                    revenue = values["TOTAL REVENUE"][k]
+                    value = float(values[metric][k])
+                    row.extend([value, round(value / revenue, 6) if revenue else None])
+            ws.append(row)
+    wb.save(path)
+
+def write_clean(path, outlets, months, seed=0):
+    """One header row (Outlet, Outlet Manager, Month, metrics...) and a row per outlet and month."""
+    rng = np.random.default_rng(seed)
+    labels = month_labels(months)
+    names, managers = outlet_names(outlets), manager_names(outlets)
+    values = metric_values(rng, outlets * months)
+    columns = [values[metric].tolist() for metric in REQUIRED_METRICS]
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    ws.append(["Outlet", "Outlet Manager", "Month"] + REQUIRED_METRICS)
+    for i in range(outlets):
+        for m, label in enumerate(labels):
+            k = i * months + m
+            ws.append([names[i], managers[i], label.split("-")[0]] + [column[k] for column in columns])
+    wb.save(path)
+
+WRITERS = {
+    "outlet-wise": write_outlet_wise,
+    "multi-sheet": write_multi_sheet,
+    "clean": write_clean,
+}
+
+def generate_workbook(layout, path, outlets, months=1, seed=0):
+    """Write a synthetic workbook in 'layout' (one of LAYOUTS) to 'path'."""
+    if layout not in WRITERS:
+        raise ValueError(f"Unknown layout '{layout}'. Use one of: {', '.join(LAYOUTS)}")
+    WRITERS[layout](path, outlets, months, seed)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic outlet P&L workbooks")
+    parser.add_argument("layout", choices=LAYOUTS)
+    parser.add_argument("--outlets", type=int, default=100, help="number of outlets (10 to 5000)")
+    parser.add_argument("--months", type=int, default=1, help="number of months (1 to 24)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="output .xlsx path")
+    args = parser.parse_args()
+
+    output = args.output or f"synthetic_{args.layout}_{args.outlets}x{args.months}.xlsx"
+    try:
+        generate_workbook(args.layout, output, args.outlets, args.months, args.seed)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return 1
+    print(f"✓ Wrote {args.layout} workbook: {output} ({args.outlets} outlets x {args.months} months)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+Gunicorn configuration for the production backend (python start_backend.py --production)
+
+  gunicorn -c gunicorn.conf.py backend_api:app
+
+Settings come from the environment:
+  BIND                          address to listen on (default 0.0.0.0:5000)
+  WEB_CONCURRENCY               worker processes (default: CPU count, at most 4)
+  GUNICORN_THREADS              threads per worker (default 4)
+  GUNICORN_MAX_REQUESTS         requests before a worker is recycled (0 = never; default 500
+                                when JOB_WORKERS=0, otherwise 0, see below)
+  GUNICORN_MAX_REQUESTS_JITTER  random extra requests so workers don't recycle together (default 50)
+  GUNICORN_TIMEOUT              seconds a request may run before its worker is restarted (default 120)
+
+Each worker keeps its own in-memory caches and /metrics counters. The on-disk parse cache,
+job records (uploads/jobs) and the history database are shared, so a dataset_id or job_id
+from one worker can be used against any other.
+
+/jobs run in the worker that accepted them, and a recycled worker drops the jobs it is
+still running (they are then reported as failed). Workers are therefore not recycled
+while /jobs is enabled unless GUNICORN_MAX_REQUESTS (or --max-requests) asks for it.
+"""
+import os
+
+# Import the heavy libraries in the master before forking, so every worker shares
+# their pages copy-on-write instead of importing its own copy
+import numpy  # noqa: F401
+import openpyxl  # noqa: F401
+import pandas  # noqa: F401
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", str(min(4, os.cpu_count() or 1))))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+worker_class = "gthread"
+
+# Load backend_api itself in the master too (app, caches and module state are then
+# inherited by each worker rather than rebuilt)
+preload_app = True
+
+# Recycle workers after a number of requests to contain memory growth from large uploads,
+# but by default only when there are no background jobs for a recycle to cut short
+jobs_enabled = int(os.environ.get("JOB_WORKERS", "2")) > 0
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "0" if jobs_enabled else "500"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "50"))
+
+# Large workbooks can take a while to parse
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+
+accesslog = "-"
+errorlog = "-"
+
+def when_ready(server):
+    cfg = server.cfg
+    server.log.info(f"Backend ready: {cfg.workers} workers x {cfg.threads} threads, "
+                    f"recycled every {cfg.max_requests} (+{cfg.max_requests_jitter}) requests")
+    if jobs_enabled and cfg.max_requests > 0:
+        server.log.warning("Worker recycling is on while /jobs is enabled: jobs still running "
+                           "in a recycled worker are dropped and reported as failed")
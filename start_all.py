@@ -2,7 +2,11 @@
 """
 Complete startup script for India Sweet House Analytics
 Starts both backend API and frontend automatically
+
+  python start_all.py                 Flask development server
+  python start_all.py --production    gunicorn with multiple workers (see gunicorn.conf.py)
 """
+import argparse
 import subprocess
 import sys
 import os
@@ -12,6 +16,8 @@ import threading
 import signal
 from pathlib import Path
 
+from start_backend import check_production_server, gunicorn_command
+
 class ProcessManager:
     def __init__(self):
         self.processes = []
@@ -76,7 +82,7 @@ def check_dependencies():
     
     return True
 
-def start_backend():
+def start_backend(production=False):
     """Start the Python backend API"""
     print("🚀 Starting Backend API...")
     try:
@@ -84,8 +90,14 @@ def start_backend():
         os.makedirs("uploads", exist_ok=True)
         
         # Start backend
+        if production:
+            if not check_production_server():
+                return None
+            command = gunicorn_command()
+        else:
+            command = [sys.executable, "backend_api.py"]
         process = subprocess.Popen(
-            [sys.executable, "backend_api.py"],
+            command,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             universal_newlines=True,
@@ -138,7 +150,7 @@ def start_frontend():
         print(f"❌ Failed to start frontend: {e}")
         return None
 
-def main():
+def main(production=False):
     """Main startup function"""
     print("🏦 India Sweet House - Complete Analytics System")
     print("=" * 60)
@@ -161,7 +173,7 @@ def main():
     
     try:
         # Start backend
-        backend_process = start_backend()
+        backend_process = start_backend(production)
         if not backend_process:
             print("❌ Failed to start backend. Exiting.")
             return False
@@ -209,5 +221,9 @@ def main():
         return False
 
 if __name__ == "__main__":
-    success = main()
+    parser = argparse.ArgumentParser(description="Start the backend API and the frontend")
+    parser.add_argument("--production", action="store_true",
+                        help="run the backend under gunicorn with multiple workers")
+    args = parser.parse_args()
+    success = main(args.production)
     sys.exit(0 if success else 1)
@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
 """
 Startup script for the financial data processing backend API
+
+  python start_backend.py                 Flask development server (debug, auto-reload)
+  python start_backend.py --production    Gunicorn pre-fork server (see gunicorn.conf.py)
+      [--workers N] [--threads N] [--max-requests N]
 """
+import argparse
 import subprocess
 import sys
 import os
@@ -29,8 +34,36 @@ def check_dependencies():
             print("❌ Failed to install dependencies")
             return False
 
-def start_backend():
-    """Start the Flask backend server"""
+def gunicorn_command(workers=None, threads=None, max_requests=None):
+    """
+    Command line running backend_api:app under gunicorn with gunicorn.conf.py
+    (preloaded app, gthread workers, recycling); given options override its defaults.
+    """
+    command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"]
+    if workers is not None:
+        command += ["--workers", str(workers)]
+    if threads is not None:
+        command += ["--threads", str(threads)]
+    if max_requests is not None:
+        command += ["--max-requests", str(max_requests)]
+    return command + ["backend_api:app"]
+
+def check_production_server():
+    """Check that gunicorn can run here (it needs a Unix-like OS)"""
+    if os.name == "nt":
+        print("❌ Production mode needs gunicorn, which does not run on Windows. "
+              "Use WSL or Docker, or start without --production.")
+        return False
+    try:
+        import gunicorn
+        print(f"✅ gunicorn {gunicorn.__version__} is installed")
+        return True
+    except ImportError:
+        print("❌ gunicorn is not installed (pip install -r requirements.txt)")
+        return False
+
+def start_backend(production=False, workers=None, threads=None, max_requests=None):
+    """Start the Flask backend server (gunicorn in production mode)"""
     print("🚀 Starting Financial Data Processing Backend API...")
     print("=" * 60)
     
@@ -42,6 +75,8 @@ def start_backend():
     # Check dependencies
     if not check_dependencies():
         return False
+    if production and not check_production_server():
+        return False
     
     # Create uploads directory
     os.makedirs("uploads", exist_ok=True)
@@ -50,14 +85,20 @@ def start_backend():
     print("\n🌐 Backend API will be available at:")
     print("   • Health check: http://localhost:5000/health")
     print("   • Process file: POST http://localhost:5000/process-file")
+    if production:
+        print("\n⚙️  Production mode: gunicorn (settings in gunicorn.conf.py)")
     print("\n📊 Frontend should be running at: http://localhost:5173")
     print("\n" + "=" * 60)
     print("Starting server... (Press Ctrl+C to stop)")
     print("=" * 60)
     
     try:
-        # Start the Flask server
-        subprocess.run([sys.executable, "backend_api.py"])
+        if production:
+            # Pre-fork server: pandas/numpy/openpyxl and the app are loaded once, then forked
+            subprocess.run(gunicorn_command(workers, threads, max_requests))
+        else:
+            # Start the Flask development server
+            subprocess.run([sys.executable, "backend_api.py"])
     except KeyboardInterrupt:
         print("\n\n🛑 Backend server stopped by user")
         return True
@@ -65,10 +106,22 @@ def start_backend():
         print(f"\n❌ Error starting backend server: {e}")
         return False
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Start the backend API")
+    parser.add_argument("--production", action="store_true",
+                        help="run under gunicorn with multiple workers instead of the Flask dev server")
+    parser.add_argument("--workers", type=int, help="worker processes (default: WEB_CONCURRENCY or CPU count, max 4)")
+    parser.add_argument("--threads", type=int, help="threads per worker (default: GUNICORN_THREADS or 4)")
+    parser.add_argument("--max-requests", type=int,
+                        help="recycle a worker after this many requests, dropping its in-flight /jobs "
+                             "(default: GUNICORN_MAX_REQUESTS, else 500 with JOB_WORKERS=0, else never)")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
     print("🏦 India Sweet House - Financial Data Processing Backend")
     print("=" * 60)
     
-    success = start_backend()
+    success = start_backend(args.production, args.workers, args.threads, args.max_requests)
     if not success:
         sys.exit(1)
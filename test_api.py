@@ -1,6 +1,7 @@
 """
 Test script for the Flask API endpoints
 """
+import json
 import requests
 import sys
 import time
@@ -45,6 +46,369 @@ def test_process_file_no_file():
         print(f"✗ Process File Test Failed: {e}")
         return False
 
+def test_process_file_cache():
+    """Test that re-uploading identical bytes is served from the result cache"""
+    try:
+        statuses = []
+        for _ in range(2):
+            with open("uploads/Outlet_PL_June-25.xlsx", "rb") as f:
+                response = requests.post(f"{BASE_URL}/process-file", files={"file": ("cache_test.xlsx", f)})
+            statuses.append(response.headers.get("X-Cache"))
+        print(f"✓ Process File (cache): {statuses}")
+        return response.status_code == 200 and statuses[-1] == "HIT"
+    except Exception as e:
+        print(f"✗ Process File Cache Test Failed: {e}")
+        return False
+
+def test_process_file_columnar():
+    """Test the opt-in columnar response layout"""
+    try:
+        with open("uploads/Outlet_PL_June-25.xlsx", "rb") as f:
+            response = requests.post(f"{BASE_URL}/process-file?format=columnar", files={"file": ("columnar_test.xlsx", f)})
+        result = response.json()
+        print(f"✓ Process File (columnar): {response.status_code} - {result.get('columns')}")
+        return (response.status_code == 200
+                and all(len(result["data"][col]) == result["outlets_count"] for col in result["columns"]))
+    except Exception as e:
+        print(f"✗ Process File Columnar Test Failed: {e}")
+        return False
+
+def test_process_file_gzip():
+    """Test that large JSON responses are compressed when the client accepts gzip"""
+    try:
+        with open("uploads/Outlet_PL_June-25.xlsx", "rb") as f:
+            response = requests.post(f"{BASE_URL}/process-file", files={"file": ("gzip_test.xlsx", f)},
+                                     headers={"Accept-Encoding": "gzip"})
+        encoding = response.headers.get("Content-Encoding")
+        print(f"✓ Process File (gzip): {response.status_code} - {encoding} - {response.headers.get('Server-Timing')}")
+        return response.status_code == 200 and encoding == "gzip" and response.json()["success"]
+    except Exception as e:
+        print(f"✗ Process File Gzip Test Failed: {e}")
+        return False
+
+def test_process_file_ndjson():
+    """Test NDJSON streaming: one outlet record per line plus a trailing summary line"""
+    try:
+        with open("uploads/Outlet_PL_June-25.xlsx", "rb") as f:
+            response = requests.post(f"{BASE_URL}/process-file?format=ndjson", files={"file": ("ndjson_test.xlsx", f)},
+                                     stream=True)
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+        summary = lines[-1]
+        print(f"✓ Process File (ndjson): {response.status_code} - {len(lines) - 1} records - {summary}")
+        return response.status_code == 200 and summary.get("summary") and summary["processed"] == len(lines) - 1
+    except Exception as e:
+        print(f"✗ Process File NDJSON Test Failed: {e}")
+        return False
+
+def write_sheet_csv(xlsx_path, sheet_name, csv_path):
+    """
+    Export a worksheet's values to CSV like Excel does: trailing blank cells and rows are
+    dropped, so rows are ragged
+    """
+    import csv
+    import openpyxl
+    wb = openpyxl.load_workbook(xlsx_path, read_only=True, data_only=True)
+    ws = wb[sheet_name]
+    ws.reset_dimensions()
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        blank_rows = 0
+        for row in ws.iter_rows(values_only=True):
+            row = list(row)
+            while row and row[-1] is None:
+                row.pop()
+            if not row:
+                blank_rows += 1
+                continue
+            writer.writerows([[]] * blank_rows)
+            blank_rows = 0
+            writer.writerow(["" if value is None else value for value in row])
+    wb.close()
+
+def write_records_csv(records, csv_path):
+    """Write outlet records to CSV in the clean layout (one header row, outlets as rows)"""
+    import csv
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(records[0]))
+        writer.writeheader()
+        writer.writerows(records)
+
+def same_records(expected, actual):
+    """Same outlet rows with the same values (numbers compared to 1e-9 relative tolerance)"""
+    import math
+    if len(expected) != len(actual):
+        return False
+    for row_a, row_b in zip(expected, actual):
+        if row_a.keys() != row_b.keys():
+            return False
+        for key, value in row_a.items():
+            other = row_b[key]
+            if isinstance(value, (int, float)) and isinstance(other, (int, float)):
+                if not math.isclose(value, other, rel_tol=1e-9, abs_tol=1e-9):
+                    return False
+            elif value != other:
+                return False
+    return True
+
+def test_process_file_csv():
+    """
+    Test CSV uploads against the xlsx fixture: the raw 'Outlet wise' layout exported with
+    ragged rows, and the clean layout (outlets as rows) uploaded under an .xlsx name so it is
+    only recognised as CSV by content
+    """
+    try:
+        import csv
+        import os
+        import tempfile
+
+        with open("uploads/Outlet_PL_June-25.xlsx", "rb") as f:
+            expected = requests.post(f"{BASE_URL}/process-file", files={"file": ("csv_fixture.xlsx", f)}).json()
+
+        with tempfile.TemporaryDirectory() as workdir:
+            raw_path, clean_path = os.path.join(workdir, "raw.csv"), os.path.join(workdir, "clean.csv")
+            write_sheet_csv("uploads/Outlet_PL_June-25.xlsx", "Outlet wise", raw_path)
+            write_records_csv(expected["data"], clean_path)
+
+            with open(raw_path, "rb") as f:
+                raw = requests.post(f"{BASE_URL}/process-file", files={"file": ("june_raw.csv", f)}).json()
+            with open(clean_path, "rb") as f:
+                clean = requests.post(f"{BASE_URL}/process-file", files={"file": ("june_clean.xlsx", f)}).json()
+            with open(raw_path, newline="") as f:
+                widths = {len(row) for row in csv.reader(f)}
+
+        print(f"✓ Process File (csv): raw {raw.get('outlets_count')}, clean {clean.get('outlets_count')}, "
+              f"xlsx {expected['outlets_count']} outlets ({len(widths)} row widths in the raw export)")
+        # The clean layout keeps only its core columns (see clean_outlet_table)
+        clean_columns = list(clean["data"][0])
+        expected_clean = [{col: row[col] for col in clean_columns} for row in expected["data"]]
+        return (len(widths) > 1 and raw["success"] and clean["success"]
+                and raw["outlets_count"] == clean["outlets_count"] == expected["outlets_count"]
+                and same_records(expected["data"], raw["data"])
+                and same_records(expected_clean, clean["data"]))
+    except Exception as e:
+        print(f"✗ Process File CSV Test Failed: {e}")
+        return False
+
+def test_csv_chunked_reader():
+    """Test that CSV results don't depend on CSV_CHUNK_ROWS (in-process: it is server configuration)"""
+    try:
+        import contextlib
+        import io
+        import os
+        import tempfile
+
+        import backend_api as backend
+        from generate_workbooks import generate_workbook
+
+        with tempfile.TemporaryDirectory() as workdir:
+            xlsx_path = os.path.join(workdir, "outlet_wise.xlsx")
+            raw_path, clean_path = os.path.join(workdir, "raw.csv"), os.path.join(workdir, "clean.csv")
+            generate_workbook("outlet-wise", xlsx_path, outlets=20)
+            write_sheet_csv(xlsx_path, "Outlet wise", raw_path)
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = {}
+                for chunk_rows in (backend.CSV_CHUNK_ROWS, 7):
+                    default_rows, backend.CSV_CHUNK_ROWS = backend.CSV_CHUNK_ROWS, chunk_rows
+                    try:
+                        raw = backend.process_financial_data(raw_path)
+                        write_records_csv(raw["data"], clean_path)
+                        results[chunk_rows] = (raw, backend.process_financial_data(clean_path))
+                    finally:
+                        backend.CSV_CHUNK_ROWS = default_rows
+
+        (raw, clean), (raw_chunked, clean_chunked) = results.values()
+        print(f"✓ CSV chunked reader: chunks of 7 rows -> {raw_chunked['outlets_count']} raw / "
+              f"{clean_chunked['outlets_count']} clean outlets")
+        return (raw["success"] and clean["success"] and raw["outlets_count"] > 0
+                and raw_chunked["data"] == raw["data"] and clean_chunked["data"] == clean["data"])
+    except Exception as e:
+        print(f"✗ CSV Chunked Reader Test Failed: {e}")
+        return False
+
+def test_interest_analysis():
+    """Test interest analysis totals and rate ordering on a small dataset"""
+    try:
+        financial_data = [
+            {"Outlet": "A", "Outlet Manager": "M1", "TOTAL REVENUE": 1000, "Finance Cost": 50, "01-Bank Charges": 10},
+            {"Outlet": "B", "Outlet Manager": "M2", "TOTAL REVENUE": 2000, "Finance Cost": 20, "04-MG": None},
+        ]
+        response = requests.post(f"{BASE_URL}/interest-analysis", json={"financial_data": financial_data})
+        result = response.json()
+        print(f"✓ Interest Analysis: {response.status_code} - total {result.get('total_interest_costs')}")
+        return (response.status_code == 200
+                and result["total_interest_costs"] == 80
+                and [o["outlet"] for o in result["outlet_analysis"]] == ["B", "A"])
+    except Exception as e:
+        print(f"✗ Interest Analysis Test Failed: {e}")
+        return False
+
+def test_interest_analysis_dataset():
+    """Test interest analysis on a server-side dataset registered by /process-file"""
+    try:
+        with open("uploads/Outlet_PL_June-25.xlsx", "rb") as f:
+            upload = requests.post(f"{BASE_URL}/process-file", files={"file": ("dataset_test.xlsx", f)}).json()
+        response = requests.post(f"{BASE_URL}/interest-analysis", json={"dataset_id": upload["dataset_id"]})
+        result = response.json()
+        print(f"✓ Interest Analysis (dataset): {response.status_code} - {result.get('message')}")
+        return response.status_code == 200 and len(result["outlet_analysis"]) == upload["outlets_count"]
+    except Exception as e:
+        print(f"✗ Interest Analysis Dataset Test Failed: {e}")
+        return False
+
+def test_jobs():
+    """Test the asynchronous job API: submit a parse, then poll it until it finishes"""
+    try:
+        with open("uploads/Outlet_PL_June-25.xlsx", "rb") as f:
+            response = requests.post(f"{BASE_URL}/jobs", files={"file": ("job_test.xlsx", f)})
+        job = response.json()
+        print(f"✓ Job created: {response.status_code} - {job.get('job_id')}")
+        for _ in range(60):
+            job = requests.get(f"{BASE_URL}/jobs/{job['job_id']}").json()
+            if job["status"] in ("completed", "failed"):
+                break
+            time.sleep(0.5)
+        print(f"✓ Job {job['status']}: {job['progress']}")
+        return response.status_code == 202 and job["status"] == "completed" and job["result"]["success"]
+    except Exception as e:
+        print(f"✗ Jobs Test Failed: {e}")
+        return False
+
+def test_batch_process():
+    """Test batch upload: two workbooks in one request, merged and tagged by source file"""
+    try:
+        with open("uploads/Outlet_PL_June-25.xlsx", "rb") as june, open("uploads/Outlet_PL_July-25.xlsx", "rb") as july:
+            response = requests.post(f"{BASE_URL}/batch-process",
+                                     files=[("files", ("june.xlsx", june)), ("files", ("july.xlsx", july))])
+        result = response.json()
+        print(f"✓ Batch: {response.status_code} - {result.get('message')}")
+        sources = {row["Source File"] for row in result["data"]}
+        return (response.status_code == 200 and result["files_failed"] == 0
+                and sources == {"june.xlsx", "july.xlsx"})
+    except Exception as e:
+        print(f"✗ Batch Test Failed: {e}")
+        return False
+
+def test_incremental_reparse():
+    """
+    Test that re-parsing a multi-sheet workbook with one edited sheet reuses the other sheets'
+    results and still matches a full parse (in-process: the multi-worksheet path has no endpoint)
+    """
+    try:
+        import contextlib
+        import io
+        import os
+        import tempfile
+
+        import openpyxl
+
+        import backend_api as backend
+        from generate_workbooks import generate_workbook
+
+        with tempfile.TemporaryDirectory() as workdir:
+            original, edited = os.path.join(workdir, "original.xlsx"), os.path.join(workdir, "edited.xlsx")
+            generate_workbook("multi-sheet", original, outlets=12)
+            # Re-save both versions with the same writer so only the edited sheet's XML differs
+            wb = openpyxl.load_workbook(original)
+            wb.save(original)
+            ws = wb["Outlet 0006"]
+            cell = next(c for row in ws.iter_rows() for c in row if isinstance(c.value, float))
+            cell.value += 1000
+            wb.save(edited)
+            sheets = wb.sheetnames[1:]
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                backend.process_multi_worksheet_outlets(original, sheets)
+                incremental = backend.process_multi_worksheet_outlets(edited, sheets)
+                cache, backend.sheet_result_cache = backend.sheet_result_cache, backend.SheetResultCache(0)
+                try:
+                    full = backend.process_multi_worksheet_outlets(edited, sheets)
+                finally:
+                    backend.sheet_result_cache = cache
+
+        print(f"✓ Incremental re-parse: reused {incremental['reused_sheets']} of {len(sheets)} sheets, "
+              f"matches full parse: {incremental['data'] == full['data']}")
+        return (incremental["success"] and incremental["reused_sheets"] == len(sheets) - 1
+                and full["reused_sheets"] == 0 and incremental["data"] == full["data"])
+    except Exception as e:
+        print(f"✗ Incremental Re-parse Test Failed: {e}")
+        return False
+
+def test_history():
+    """
+    Test the history store against a temp database (in-process, so it runs without
+    HISTORY_DB_PATH on the server): YYYY-MM keys from the header year, range queries,
+    idempotent upserts, and the same month name in two years kept apart
+    """
+    try:
+        import contextlib
+        import io
+        import os
+        import tempfile
+
+        import backend_api as backend
+        from generate_workbooks import generate_workbook
+
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, "outlet-wise.xlsx")
+            generate_workbook("outlet-wise", path, outlets=5, months=12)  # April-24 .. March-25
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = backend.process_financial_data(path, "columnar")
+                store = backend.HistoryStore(os.path.join(workdir, "history.db"))
+                this_year = backend.result_frame(result)
+                written = store.record(this_year, "this-year")
+                store.record(this_year, "this-year")  # re-upload: upsert, no new rows
+
+                # Next year's workbook: same month names, a year later, different values
+                next_year = backend.result_frame({
+                    **result,
+                    "month_periods": {month: f"{int(key[:4]) + 1}{key[4:]}"
+                                      for month, key in result["month_periods"].items()},
+                })
+                next_year["TOTAL REVENUE"] += 1
+                store.record(next_year, "next-year")
+                yearless = store.record(backend.result_frame({**result, "month_periods": {}}), "yearless")
+
+                summer = store.query(start="2024-06", end="2024-08")
+                junes = store.query(start="2024-06", end="2025-06", metrics=["TOTAL REVENUE"])
+                everything = store.query()
+
+        june_revenue = {record["Month"]: record["TOTAL REVENUE"] for record in junes
+                        if record["Outlet"] == junes[0]["Outlet"] and record["Month"].endswith("-06")}
+        print(f"✓ History: {written} metric rows, {len(summer)} records for 2024-06..2024-08, "
+              f"{len(everything)} in total, June revenue by year {june_revenue}")
+        return (result["month_periods"]["June"] == "2024-06" and yearless == 0
+                and len(summer) == 3 * 5 and {r["Month"] for r in summer} == {"2024-06", "2024-07", "2024-08"}
+                and len(everything) == 2 * 12 * 5
+                and june_revenue.get("2025-06") == june_revenue.get("2024-06") + 1)
+    except Exception as e:
+        print(f"✗ History Test Failed: {e}")
+        return False
+
+def test_metrics():
+    """Test stage timing: Server-Timing on a parse, then the histograms at /metrics"""
+    try:
+        with open("uploads/Outlet_PL_June-25.xlsx", "rb") as f:
+            response = requests.post(f"{BASE_URL}/process-file", files={"file": ("metrics_test.xlsx", f)})
+        server_timing = response.headers.get("Server-Timing", "")
+        print(f"✓ Server-Timing: {server_timing[:80]}...")
+        metrics = requests.get(f"{BASE_URL}/metrics")
+        print(f"✓ Metrics: {metrics.status_code} - {len(metrics.text.splitlines())} lines")
+        return ("total;dur=" in server_timing and metrics.status_code == 200
+                and "parse_stage_duration_seconds_bucket" in metrics.text)
+    except Exception as e:
+        print(f"✗ Metrics Test Failed: {e}")
+        return False
+
+def test_profiles_auth():
+    """Test that profiles are not listed without the profile token"""
+    try:
+        response = requests.get(f"{BASE_URL}/profiles")
+        print(f"✓ Profiles without token: {response.status_code} - {response.json().get('error')}")
+        return response.status_code in (403, 404)
+    except Exception as e:
+        print(f"✗ Profiles Test Failed: {e}")
+        return False
+
 if __name__ == "__main__":
     print("=" * 60)
     print("Testing Flask API Endpoints")
@@ -54,6 +418,20 @@ if __name__ == "__main__":
         ("Health Check", test_health),
         ("Root Endpoint", test_root),
         ("Process File (no file)", test_process_file_no_file),
+        ("Process File (cache)", test_process_file_cache),
+        ("Process File (columnar)", test_process_file_columnar),
+        ("Process File (gzip)", test_process_file_gzip),
+        ("Process File (ndjson)", test_process_file_ndjson),
+        ("Process File (csv)", test_process_file_csv),
+        ("CSV Chunked Reader", test_csv_chunked_reader),
+        ("Interest Analysis", test_interest_analysis),
+        ("Interest Analysis (dataset)", test_interest_analysis_dataset),
+        ("Jobs", test_jobs),
+        ("Batch Process", test_batch_process),
+        ("History", test_history),
+        ("Incremental Re-parse", test_incremental_reparse),
+        ("Metrics", test_metrics),
+        ("Profiles (auth)", test_profiles_auth),
     ]
     
     results = []